@@ -1,18 +1,23 @@
 import bpy
+import time
+import numpy as np
+from collections import defaultdict
 
 # This script sets up the jiggle bone weights for the bust jiggle bones
 # Please run AttachJiggleBones.py first to attach the jiggle bones to the armature of the active object
 # This script will weight the newly attached jiggle bones the same amount as the corresponding bust bones
+# The functions below work on the given mesh object (the active object by default), so they can also be called from other scripts (ex. BatchJigglePhysics.py)
 
 
 # Copies the vertex group weights from one group to another vertex group (creating if necessary)
-def copy_vertex_group_weights(source_group_name, target_group_name):
-    # Get the active object (assumed to be a mesh)
-    obj = bpy.context.active_object
+def copy_vertex_group_weights(source_group_name, target_group_name, obj=None):
+    # Default to the active object (assumed to be a mesh)
+    if obj is None:
+        obj = bpy.context.active_object
 
     # Ensure the object is a mesh
     if obj.type != 'MESH':
-        print("Active object is not a mesh.")
+        print(f"Object '{obj.name}' is not a mesh.")
         return
 
     # Ensure the object has vertex groups
@@ -34,55 +39,144 @@ def copy_vertex_group_weights(source_group_name, target_group_name):
         target_group = obj.vertex_groups.new(name=target_group_name)
 
     # Copy weights from source to target group
-    for v in obj.data.vertices:
+    # Calling target_group.add() once per vertex is very slow on big meshes, so instead we collect all the source weights in one pass,
+    # group the vertex indices by weight, and call add() once per distinct weight
+    # Note: Vertex group weights can't be read with foreach_get(), so the collection pass still visits each vertex's groups in Python
+    start_time = time.perf_counter()
+    vertices = obj.data.vertices
+    wm = bpy.context.window_manager
+    wm.progress_begin(0, len(vertices))
+    indices_by_weight = defaultdict(list)
+    source_index = source_group.index
+    for v in vertices:
         for g in v.groups:
-            if g.group == source_group.index:
-                target_group.add([v.index], g.weight, 'REPLACE')
+            if g.group == source_index:
+                indices_by_weight[g.weight].append(v.index)
                 break
+        if v.index % 10000 == 0:
+            wm.progress_update(v.index)
+    wm.progress_end()
+    collect_time = time.perf_counter() - start_time
+
+    for weight, indices in indices_by_weight.items():
+        target_group.add(indices, weight, 'REPLACE')
+
+    vertex_count = sum(len(indices) for indices in indices_by_weight.values())
+    print(f"Copied {vertex_count} weights from '{source_group_name}' to '{target_group_name}' with {len(indices_by_weight)} add calls "
+          f"in {time.perf_counter() - start_time:.2f}s (collecting weights took {collect_time:.2f}s)")
 
 # Given a list of vertex groups, lock those vertex groups and normalize all weights of the rest
-def lock_vertex_groups_and_normalize(vertex_groups_to_lock):
-    # Get the active object (assumed to be a mesh)
-    obj = bpy.context.active_object
+# This does the same as locking the groups and running bpy.ops.object.vertex_group_normalize_all(group_select_mode='BONE_DEFORM'),
+# but works on the weight data directly: all deform weights are read into a (vertices x groups) array once, normalized with
+# array operations, and written back. That avoids two full-mesh operator passes (and undo pushes), and it doesn't need a UI context.
+def lock_vertex_groups_and_normalize(vertex_groups_to_lock, obj=None):
+    # Default to the active object (assumed to be a mesh)
+    if obj is None:
+        obj = bpy.context.active_object
 
     # Ensure the object is a mesh
     if obj.type != 'MESH':
-        print("Active object is not a mesh.")
+        print(f"Object '{obj.name}' is not a mesh.")
         return
 
-    # Unlock all vertex groups first
-    bpy.ops.object.vertex_group_lock(action='UNLOCK', mask='ALL')
+    start_time = time.perf_counter()
+    deform_group_indices = get_deform_group_indices(obj)
+    if not deform_group_indices:
+        print(f"Object '{obj.name}' has no vertex groups for deform bones. Nothing to normalize.")
+        return
 
-    # Lock the specified vertex groups
     for group_name in vertex_groups_to_lock:
-        group = obj.vertex_groups.get(group_name)
-        if group:
-            group.lock_weight = True
-        else:
+        if obj.vertex_groups.get(group_name) is None:
             print(f"Vertex group '{group_name}' does not exist.")
+    locked = np.array([obj.vertex_groups[i].name in vertex_groups_to_lock for i in deform_group_indices])
 
-    # Normalize all other vertex groups
-    bpy.ops.object.vertex_group_normalize_all(group_select_mode='BONE_DEFORM', lock_active=False)
+    weights, member, group_counts = read_vertex_group_weights(obj, deform_group_indices)
+    read_time = time.perf_counter() - start_time
 
-    # Unlock all vertex groups again
-    bpy.ops.object.vertex_group_lock(action='UNLOCK', mask='ALL')
+    # Normalize all other vertex groups
+    normalized = normalize_weights(weights, member, group_counts, locked)
 
-    # Normalize all vertex groups again after unlocking everything
+    # Normalize all vertex groups again, this time with nothing locked
     # This addresses the case where the locked vertex groups already had a combined weight of over 1.0
     # Example: l_bust_jnt and l_bust_jig both have weights of 0.7. The first normalization above would remove
     #   any weight from any of the unlocked vertex groups (like maybe c_spine2_jnt). This second normalization
     #   below would normalize l_bust_jnt and l_bust_jig to 0.5 each.
-    bpy.ops.object.vertex_group_normalize_all(group_select_mode='BONE_DEFORM', lock_active=False)
+    normalized = normalize_weights(normalized, member, group_counts, np.zeros_like(locked))
+
+    changed_count = write_vertex_group_weights(obj, deform_group_indices, weights, normalized)
+
+    # Leave every vertex group unlocked, the same as before
+    for group in obj.vertex_groups:
+        group.lock_weight = False
+
+    print(f"Normalized {len(deform_group_indices)} deform vertex groups of '{obj.name}' ({changed_count} weights changed) "
+          f"in {time.perf_counter() - start_time:.2f}s (reading weights took {read_time:.2f}s)")
+
+# Indices of the vertex groups that belong to deform bones of the object's armature (what group_select_mode='BONE_DEFORM' uses)
+def get_deform_group_indices(obj):
+    armature = obj.find_armature()
+    if armature is None:
+        return []
+    deform_bone_names = {bone.name for bone in armature.data.bones if bone.use_deform}
+    return [group.index for group in obj.vertex_groups if group.name in deform_bone_names]
+
+# Reads the weights of the given vertex groups in one pass over the mesh
+# Returns (weights, member, group_counts):
+#   weights[v, i] is the weight of vertex v in group_indices[i] (0 if the vertex is not in the group)
+#   member[v, i] is True if vertex v is in group_indices[i] (a vertex can be in a group with a weight of 0)
+#   group_counts[v] is the number of groups (of any kind) that vertex v is in
+def read_vertex_group_weights(obj, group_indices):
+    columns = {group_index: column for column, group_index in enumerate(group_indices)}
+    vertex_count = len(obj.data.vertices)
+    weights = np.zeros((vertex_count, len(group_indices)), dtype=np.float32)
+    member = np.zeros((vertex_count, len(group_indices)), dtype=bool)
+    group_counts = np.zeros(vertex_count, dtype=np.int32)
+    for v in obj.data.vertices:
+        groups = v.groups
+        group_counts[v.index] = len(groups)
+        for g in groups:
+            column = columns.get(g.group)
+            if column is not None:
+                weights[v.index, column] = g.weight
+                member[v.index, column] = True
+    return weights, member, group_counts
+
+# Normalizes the weights of every vertex with Blender's locked group rules (same as BKE_defvert_normalize_lock_map):
+#   - The unlocked weights are scaled so that they add up to whatever weight the locked groups leave (1 - sum of locked weights, at least 0)
+#   - A vertex that is in a single group gets a weight of 1 in that group, unless the group is locked
+#   - Locked weights and weights of vertices without any unlocked weight are left alone
+def normalize_weights(weights, member, group_counts, locked):
+    unlocked_member = member & ~locked
+    locked_member = member & locked
+    total_weight = np.where(unlocked_member, weights, 0).sum(axis=1, dtype=np.float32)
+    remaining_weight = np.maximum(np.float32(1) - np.where(locked_member, weights, 0).sum(axis=1, dtype=np.float32), 0)
+    scalar = np.divide(remaining_weight, total_weight, out=np.ones_like(total_weight), where=total_weight > 0)
+    normalized = np.where(unlocked_member & (total_weight > 0)[:, None], np.clip(weights * scalar[:, None], 0, 1), weights)
+    single_group = unlocked_member & (group_counts == 1)[:, None]
+    return np.where(single_group, np.float32(1), normalized).astype(np.float32)
+
+# Writes back the weights that changed by setting them directly on each vertex's group elements (no per-vertex add() calls)
+# Returns the number of weights that changed
+def write_vertex_group_weights(obj, group_indices, old_weights, new_weights):
+    changed = old_weights != new_weights
+    changed_vertices = np.flatnonzero(changed.any(axis=1))
+    columns = {group_index: column for column, group_index in enumerate(group_indices)}
+    vertices = obj.data.vertices
+    for vertex_index in changed_vertices:
+        for g in vertices[vertex_index].groups:
+            column = columns.get(g.group)
+            if column is not None and changed[vertex_index, column]:
+                g.weight = float(new_weights[vertex_index, column])
+    return int(changed.sum())
 
 # Set up bust jiggle bone weights by copying the weights from the bust bone to the corresponding jiggle bone
 # and then normalizing the weights of the rest of the vertex groups to take weight away from them.
-def addJiggleBoneWeight(source_bones, target_bones):
+def addJiggleBoneWeight(source_bones, target_bones, obj=None):
     for source_bone, target_bone in zip(source_bones, target_bones):
-        copy_vertex_group_weights(source_bone, target_bone)
-    lock_vertex_groups_and_normalize(source_bones + target_bones)    # Lock both source and target bones
+        copy_vertex_group_weights(source_bone, target_bone, obj)
+    lock_vertex_groups_and_normalize(source_bones + target_bones, obj)    # Lock both source and target bones
 
 
-# "Main"
 source_bones = [
     "l_bust_jnt",
     "r_bust_jnt",
@@ -91,4 +185,7 @@ target_bones = [
     "l_bust_jig",
     "r_bust_jig",
 ]
-addJiggleBoneWeight(source_bones, target_bones)
\ No newline at end of file
+
+# "Main"
+if __name__ == "__main__":
+    addJiggleBoneWeight(source_bones, target_bones)
@@ -1,59 +1,106 @@
 import bpy
+import time
 
 # This script attaches the jiggle bones from the Base Body onto armature of the active object
+# attach_jiggle_bones() can also be called from other scripts (ex. BatchJigglePhysics.py) with a different target, armature name, or parent bone
+
+defaultJiggleBonesArmatureName = "SpringBones"
+defaultJiggleBonesTargetParentBoneName = "c_spine2_jnt"  # AFTER joining to the target armature, this will be the parent bone of the jiggle bones
 
-jiggleBonesArmatureName = "SpringBones"
-jiggleBonesTargetParentBoneName = "c_spine2_jnt"  # AFTER joining to the target armature, this will be the parent bone of the jiggle bones
 
-# The target object is the active object
 # We want the armature of the target object. Allow the user to select either the armature, the root object, or a mesh inside the armature
-target_object = bpy.context.active_object
-if target_object.type == 'ARMATURE':
-    target_armature = target_object
-elif target_object.type == 'MESH':
-    target_armature = target_object.find_armature()
-elif target_object.type == 'EMPTY' and len(target_object.children) > 0 and target_object.children[0].type == 'ARMATURE':  # root object
-    target_armature = target_object.children[0]
-else:
-    raise ValueError("The active object is not a valid armature, mesh, or root object with an armature child.")
-
-# Get the source armature. This is the one that has the jiggle bones
-# Note: We are searching bpy.data.objects instead of bpy.data.armatures because we want the "Object" type object so that we can select it
-#   bpy.data.armatures returns "Armature" type objects, which is equivalent to the "obj.data" property of the "Object" type object
-indexOfSourceArmature = bpy.data.objects.find(jiggleBonesArmatureName)
-if indexOfSourceArmature == -1:
-    raise ValueError(f"Armature '{jiggleBonesArmatureName}' not found in the current blend file.")
-source_armature = bpy.data.objects[indexOfSourceArmature]
-
-# Joining armatures has been shown to mess up bone roll values, so save the bone roll values of the source armature to be restored later
-# Note: We must be in edit mode on the source armature to access the bone properties
-#   We have to deslect everything first in case there's an object selected that can't enter edit mode (such as the root object of the target armature)
-bpy.ops.object.select_all(action='DESELECT')    # Deselect all objects
-bpy.context.view_layer.objects.active = source_armature    # Set the source armature as the active object so that we can enter edit mode on it
-bpy.ops.object.mode_set(mode='EDIT')    # Switch to edit mode to access bone properties
-source_bone_rolls = {}
-for bone in source_armature.data.edit_bones:
-    source_bone_rolls[bone.name] = bone.roll
-
-# Also save the name of the root jiggle bone. This should be the first bone in the list of bones in the source armature
-rootJiggleBoneName = source_armature.data.bones[0].name
-
-# Join the jiggle bones armature into the target armature
-bpy.ops.object.mode_set(mode='OBJECT')
-bpy.ops.object.select_all(action='DESELECT')    # Deselect all objects
-target_armature.select_set(True)    # Select the target armature
-source_armature.select_set(True)    # Select the source armature
-bpy.context.view_layer.objects.active = target_armature    # Set the target armature as the active object
-bpy.ops.object.join()    # Join the two armatures
-
-# Fix the bone rolls of the jiggle bones
-bpy.ops.object.mode_set(mode='EDIT')    # Switch to edit mode to access bone properties
-for boneName in source_bone_rolls.keys():
-    target_armature.data.edit_bones[boneName].roll = source_bone_rolls[boneName]    # Set the roll value to the saved value
-
-# Set the parent of the jiggle bones to the target parent bone
-# Note: Still needs to be done in Edit mode
-target_armature.data.edit_bones[rootJiggleBoneName].parent = target_armature.data.edit_bones[jiggleBonesTargetParentBoneName]
-
-# Return to object mode
-bpy.ops.object.mode_set(mode='OBJECT')
\ No newline at end of file
+def find_target_armature(target_object):
+    if target_object.type == 'ARMATURE':
+        return target_object
+    elif target_object.type == 'MESH':
+        return target_object.find_armature()
+    elif target_object.type == 'EMPTY' and len(target_object.children) > 0 and target_object.children[0].type == 'ARMATURE':  # root object
+        return target_object.children[0]
+    else:
+        raise ValueError("The active object is not a valid armature, mesh, or root object with an armature child.")
+
+
+# Joins the jiggle bones armature (jiggleBonesArmatureName) into the armature of target_object
+# and parents the root jiggle bone to jiggleBonesTargetParentBoneName. Returns the target armature.
+def attach_jiggle_bones(target_object, jiggleBonesArmatureName=defaultJiggleBonesArmatureName,
+                        jiggleBonesTargetParentBoneName=defaultJiggleBonesTargetParentBoneName):
+    target_armature = find_target_armature(target_object)
+
+    # Get the source armature. This is the one that has the jiggle bones
+    # Note: We are searching bpy.data.objects instead of bpy.data.armatures because we want the "Object" type object so that we can select it
+    #   bpy.data.armatures returns "Armature" type objects, which is equivalent to the "obj.data" property of the "Object" type object
+    indexOfSourceArmature = bpy.data.objects.find(jiggleBonesArmatureName)
+    if indexOfSourceArmature == -1:
+        raise ValueError(f"Armature '{jiggleBonesArmatureName}' not found in the current blend file.")
+    source_armature = bpy.data.objects[indexOfSourceArmature]
+
+    # Joining armatures has been shown to mess up bone roll values, so save the bones of the source armature to be restored later
+    # The snapshot is read from the bone data in object mode, so we don't need an extra trip into edit mode for it
+    start_time = time.perf_counter()
+    if bpy.context.mode != 'OBJECT':
+        bpy.ops.object.mode_set(mode='OBJECT')
+    source_bones = snapshot_bones(source_armature)
+    # The bone positions are in the source armature's space. After joining, they need to be in the target armature's space.
+    source_to_target = target_armature.matrix_world.inverted() @ source_armature.matrix_world
+
+    # Also save the name of the root jiggle bone. This should be the first bone in the list of bones in the source armature
+    rootJiggleBoneName = source_armature.data.bones[0].name
+    snapshot_time = time.perf_counter() - start_time
+
+    # Join the jiggle bones armature into the target armature
+    # We have to deselect everything first in case there's another object selected that would also get joined
+    start_time = time.perf_counter()
+    bpy.ops.object.select_all(action='DESELECT')    # Deselect all objects
+    target_armature.select_set(True)    # Select the target armature
+    source_armature.select_set(True)    # Select the source armature
+    bpy.context.view_layer.objects.active = target_armature    # Set the target armature as the active object
+    bpy.ops.object.join()    # Join the two armatures
+    join_time = time.perf_counter() - start_time
+
+    # Fix the jiggle bones and parent them, all in a single edit mode session
+    start_time = time.perf_counter()
+    bpy.ops.object.mode_set(mode='EDIT')    # Switch to edit mode to access bone properties
+    restore_bones(target_armature, source_bones, source_to_target)
+
+    # Set the parent of the jiggle bones to the target parent bone
+    # Note: Still needs to be done in Edit mode
+    target_armature.data.edit_bones[rootJiggleBoneName].parent = target_armature.data.edit_bones[jiggleBonesTargetParentBoneName]
+
+    # Return to object mode
+    bpy.ops.object.mode_set(mode='OBJECT')
+    restore_time = time.perf_counter() - start_time
+
+    print(f"Attached {len(source_bones)} jiggle bones to '{target_armature.name}': snapshot {snapshot_time:.3f}s, "
+          f"join {join_time:.3f}s, restore {restore_time:.3f}s")
+    return target_armature
+
+
+# Saves the head, tail, roll and parent of every bone of an armature in one pass, without entering edit mode
+# Returns {bone name: (head, tail, roll, parent name or None)}, with positions in the armature's local space
+def snapshot_bones(armature):
+    snapshot = {}
+    for bone in armature.data.bones:
+        # Bones don't store their roll outside of edit mode, but it can be recovered from the bone's rest matrix
+        _, roll = bpy.types.Bone.AxisRollFromMatrix(bone.matrix_local.to_3x3())
+        parent_name = bone.parent.name if bone.parent else None
+        snapshot[bone.name] = (bone.head_local.copy(), bone.tail_local.copy(), roll, parent_name)
+    return snapshot
+
+
+# Restores bones saved with snapshot_bones(). Must be called in edit mode on the armature.
+# matrix converts the saved positions into the armature's local space
+def restore_bones(armature, snapshot, matrix):
+    edit_bones = armature.data.edit_bones
+    for bone_name, (head, tail, roll, parent_name) in snapshot.items():
+        edit_bone = edit_bones[bone_name]
+        edit_bone.head = matrix @ head
+        edit_bone.tail = matrix @ tail
+        edit_bone.roll = roll    # Set the roll value to the saved value (after head and tail, since moving them can change the roll)
+        if parent_name is not None:
+            edit_bone.parent = edit_bones[parent_name]
+
+
+# "Main"
+if __name__ == "__main__":
+    # The target object is the active object
+    attach_jiggle_bones(bpy.context.active_object)
@@ -0,0 +1,87 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Runs AttachJiggleBones.py and AddJiggleBoneWeight.py over many .blend files, using several headless Blender processes in parallel
+# Run this with any Python 3 (it does not need bpy). Each file is handled by JigglePhysicsWorker.py inside "blender --background".
+#
+# Usage: python BatchJigglePhysics.py <file.blend>... [--blender PATH] [--jobs N] [--in-place] [worker options]
+# By default, each result is saved next to its input as "<name>_jiggle.blend".
+# See --help for the worker options (armature name, parent bone, meshes, etc.)
+
+workerScriptPath = os.path.join(os.path.dirname(os.path.abspath(__file__)), "JigglePhysicsWorker.py")
+resultPrefix = "JIGGLE_RESULT "
+
+def get_output_path(blendFile, inPlace):
+    return blendFile if inPlace else os.path.splitext(blendFile)[0] + "_jiggle.blend"
+
+def run_worker(blenderPath, blendFile, outputPath, workerArgs):
+    command = [blenderPath, "--background", blendFile, "--python-exit-code", "1", "--python", workerScriptPath,
+               "--", "--output", outputPath, *workerArgs]
+    start = time.perf_counter()
+    try:
+        process = subprocess.run(command, capture_output=True, text=True, encoding="utf-8", errors="replace")
+    except OSError as e:
+        return blendFile, time.perf_counter() - start, None, f"Could not run Blender ({blenderPath}): {e}"
+    elapsed = time.perf_counter() - start
+
+    timings = None
+    for line in process.stdout.splitlines():
+        if line.startswith(resultPrefix):
+            timings = json.loads(line[len(resultPrefix):])
+    error = None
+    if process.returncode != 0 or timings is None:
+        # Keep the end of Blender's output, which has the Python traceback
+        output = (process.stdout + process.stderr).strip().splitlines()
+        error = f"Blender exited with code {process.returncode}\n" + "\n".join(output[-20:])
+    return blendFile, elapsed, timings, error
+
+def run_batch(blendFiles, blenderPath, jobs, inPlace, workerArgs):
+    failures = []
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = [executor.submit(run_worker, blenderPath, blendFile, get_output_path(blendFile, inPlace), workerArgs)
+                   for blendFile in blendFiles]
+        for future in as_completed(futures):
+            blendFile, elapsed, timings, error = future.result()
+            if error is None:
+                steps = ", ".join(f"{step} {seconds:.2f}s" for step, seconds in timings.items() if step != "meshes")
+                print(f"{blendFile} : {elapsed:.2f}s ({steps}) meshes: {', '.join(timings['meshes']) or 'none'}")
+            else:
+                print(f"{blendFile} : FAILED after {elapsed:.2f}s")
+                failures.append((blendFile, error))
+
+    print(f"Processed {len(blendFiles) - len(failures)}/{len(blendFiles)} files in {time.perf_counter() - start:.2f}s")
+    for blendFile, error in failures:
+        print(f"--- {blendFile}")
+        print(error)
+    return failures
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Attaches jiggle bones and adds their weights in many .blend files using headless Blender")
+    parser.add_argument("blendFiles", nargs="+", help=".blend files to process")
+    parser.add_argument("--blender", default="blender", help="Path to the Blender executable (default: blender on the PATH)")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count(), help="Number of Blender processes to run at the same time")
+    parser.add_argument("--in-place", action="store_true", help="Overwrite the input files instead of saving <name>_jiggle.blend")
+    # Passed through to JigglePhysicsWorker.py
+    parser.add_argument("--base-body", help="FBX to import the jiggle bones armature from (default: BaseBodyF.fbx in this folder)")
+    parser.add_argument("--armature", help="Name of the object to attach the jiggle bones to (default: the first armature)")
+    parser.add_argument("--meshes", nargs="+", help="Names of the meshes to add jiggle bone weights to (default: every mesh using the armature)")
+    parser.add_argument("--jiggle-armature", help="Name of the jiggle bones armature (default: SpringBones)")
+    parser.add_argument("--parent-bone", help="Bone to parent the jiggle bones to (default: c_spine2_jnt)")
+    args = parser.parse_args()
+
+    workerArgs = []
+    for option in ("base_body", "armature", "jiggle_armature", "parent_bone"):
+        value = getattr(args, option)
+        if value is not None:
+            workerArgs += ["--" + option.replace("_", "-"), value]
+    if args.meshes:
+        workerArgs += ["--meshes", *args.meshes]
+
+    failures = run_batch(args.blendFiles, args.blender, args.jobs, args.in_place, workerArgs)
+    sys.exit(1 if failures else 0)
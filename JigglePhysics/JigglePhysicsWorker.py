@@ -0,0 +1,82 @@
+import bpy
+import argparse
+import json
+import os
+import sys
+import time
+
+# Runs AttachJiggleBones and AddJiggleBoneWeight on the .blend file that Blender opened, without needing the UI
+# This is launched by BatchJigglePhysics.py, once per .blend file:
+#   blender --background <file.blend> --python-exit-code 1 --python JigglePhysicsWorker.py -- [options]
+# On success, the last line of output is "JIGGLE_RESULT " followed by the timing of each step as JSON
+
+# Make the other scripts in this folder importable
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import AttachJiggleBones
+import AddJiggleBoneWeight
+
+resultPrefix = "JIGGLE_RESULT "
+
+def parse_args():
+    # Blender ignores everything after "--", so that's where our own arguments go
+    argv = sys.argv[sys.argv.index("--") + 1:] if "--" in sys.argv else []
+    parser = argparse.ArgumentParser(prog="JigglePhysicsWorker.py")
+    parser.add_argument("--output", required=True, help="Path to save the modified .blend file to")
+    parser.add_argument("--base-body", default=os.path.join(os.path.dirname(os.path.abspath(__file__)), "BaseBodyF.fbx"),
+                        help="FBX to import the jiggle bones armature from, if the .blend file does not already have it")
+    parser.add_argument("--armature", default=None, help="Name of the object to attach the jiggle bones to (default: the first armature)")
+    parser.add_argument("--meshes", nargs="*", default=None, help="Names of the meshes to add jiggle bone weights to (default: every mesh using the armature)")
+    parser.add_argument("--jiggle-armature", default=AttachJiggleBones.defaultJiggleBonesArmatureName, help="Name of the jiggle bones armature")
+    parser.add_argument("--parent-bone", default=AttachJiggleBones.defaultJiggleBonesTargetParentBoneName, help="Bone to parent the jiggle bones to")
+    return parser.parse_args(argv)
+
+def main():
+    args = parse_args()
+    timings = {}
+
+    # Import the jiggle bones armature (the same as step 2 of the README) unless it is already in the file
+    start = time.perf_counter()
+    importedObjectNames = set()
+    if bpy.data.objects.get(args.jiggle_armature) is None:
+        objectNamesBefore = set(bpy.data.objects.keys())
+        bpy.ops.import_scene.fbx(filepath=args.base_body)
+        importedObjectNames = set(bpy.data.objects.keys()) - objectNamesBefore
+    timings["import"] = time.perf_counter() - start
+
+    # Attach the jiggle bones
+    start = time.perf_counter()
+    if args.armature is not None:
+        target_object = bpy.data.objects[args.armature]
+    else:
+        armatures = [obj for obj in bpy.data.objects
+                     if obj.type == 'ARMATURE' and obj.name != args.jiggle_armature and obj.name not in importedObjectNames]
+        if not armatures:
+            raise ValueError("No armature found to attach the jiggle bones to.")
+        target_object = armatures[0]
+    target_armature = AttachJiggleBones.attach_jiggle_bones(target_object, args.jiggle_armature, args.parent_bone)
+
+    # Delete the rest of the stuff that came from the imported FBX (the jiggle bones armature itself was joined into the target)
+    for name in importedObjectNames:
+        obj = bpy.data.objects.get(name)
+        if obj is not None:
+            bpy.data.objects.remove(obj, do_unlink=True)
+    timings["attach"] = time.perf_counter() - start
+
+    # Add the jiggle bone weights to each mesh
+    start = time.perf_counter()
+    if args.meshes is not None:
+        meshes = [bpy.data.objects[name] for name in args.meshes]
+    else:
+        meshes = [obj for obj in bpy.data.objects if obj.type == 'MESH' and obj.find_armature() == target_armature]
+    for mesh in meshes:
+        AddJiggleBoneWeight.addJiggleBoneWeight(AddJiggleBoneWeight.source_bones, AddJiggleBoneWeight.target_bones, mesh)
+    timings["weights"] = time.perf_counter() - start
+    timings["meshes"] = [mesh.name for mesh in meshes]
+
+    start = time.perf_counter()
+    bpy.ops.wm.save_as_mainfile(filepath=os.path.abspath(args.output))
+    timings["save"] = time.perf_counter() - start
+
+    print(resultPrefix + json.dumps(timings))
+
+main()
@@ -0,0 +1,95 @@
+import ast
+from pathlib import Path
+import numpy as np
+
+# AddJiggleBoneWeight.py is run from Blender's text editor as a single file, and imports bpy, which only exists inside Blender.
+# normalize_weights() only uses NumPy, so it is compiled on its own from the script's source.
+def load_function(scriptPath, functionName):
+    module = ast.parse(Path(scriptPath).read_text(encoding='utf-8'))
+    function = next(node for node in module.body if isinstance(node, ast.FunctionDef) and node.name == functionName)
+    namespace = {'np': np}
+    exec(compile(ast.Module(body=[function], type_ignores=[]), str(scriptPath), 'exec'), namespace)
+    return namespace[functionName]
+
+normalize_weights = load_function(Path(__file__).parent.parent / 'AddJiggleBoneWeight.py', 'normalize_weights')
+
+# Scalar port of Blender's BKE_defvert_normalize_lock_map() (blenkernel/intern/deform.cc), for one vertex
+#   weights maps the columns of the deform groups the vertex is in to their weights
+#   group_count is the number of groups (of any kind) that the vertex is in
+#   locked[column] is True if the group of that column is locked
+def normalize_vertex_lock_map(weights, group_count, locked):
+    weights = {column: np.float32(weight) for column, weight in weights.items()}
+    if group_count == 1:
+        for column in weights:
+            if not locked[column]:
+                weights[column] = np.float32(1)
+    elif group_count > 1:
+        tot_weight = np.float32(0)
+        lock_iweight = np.float32(0)
+        for column, weight in weights.items():
+            if locked[column]:
+                lock_iweight += weight
+            else:
+                tot_weight += weight
+        if tot_weight > 0:
+            lock_iweight = max(np.float32(0), np.float32(1) - lock_iweight)
+            scalar = (np.float32(1) / tot_weight) * lock_iweight
+            for column in weights:
+                if not locked[column]:
+                    weights[column] = min(max(weights[column] * scalar, np.float32(0)), np.float32(1))
+    return weights
+
+# Runs both the vectorized and the scalar normalization, checks that they agree, and returns the vectorized result
+def normalize_and_compare(weights, member, group_counts, locked):
+    weights = np.asarray(weights, dtype=np.float32)
+    member = np.asarray(member, dtype=bool)
+    group_counts = np.asarray(group_counts, dtype=np.int32)
+    locked = np.asarray(locked, dtype=bool)
+    normalized = normalize_weights(weights, member, group_counts, locked)
+    expected = weights.copy()
+    for v in range(len(weights)):
+        vertex_weights = {column: weights[v, column] for column in np.flatnonzero(member[v])}
+        for column, weight in normalize_vertex_lock_map(vertex_weights, group_counts[v], locked).items():
+            expected[v, column] = weight
+    assert normalized.dtype == np.float32
+    np.testing.assert_allclose(normalized, expected, rtol=0, atol=1e-6)
+    return normalized
+
+def test_random_weights():
+    rng = np.random.default_rng(0)
+    vertex_count, group_count = 2000, 6
+    member = rng.random((vertex_count, group_count)) < 0.4
+    weights = np.where(member, rng.random((vertex_count, group_count)), 0).astype(np.float32)
+    weights[rng.random((vertex_count, group_count)) < 0.05] = 0
+    # Some vertices are also in groups that are not deform groups
+    group_counts = member.sum(axis=1) + rng.integers(0, 2, vertex_count)
+    locked = np.array([True, True, False, False, False, False])
+    normalized = normalize_and_compare(weights, member, group_counts, locked)
+    normalize_and_compare(normalized, member, group_counts, np.zeros_like(locked))
+
+def test_locked_sum_at_least_one():
+    # l_bust_jnt and l_bust_jig (locked) both at 0.7: the unlocked c_spine2_jnt loses all its weight
+    normalized = normalize_and_compare([[0.7, 0.7, 0.4]], [[True, True, True]], [3], [True, True, False])
+    np.testing.assert_allclose(normalized, [[0.7, 0.7, 0]])
+    # Then the second pass, with nothing locked, splits the weight between the bust groups
+    normalized = normalize_and_compare(normalized, [[True, True, True]], [3], [False, False, False])
+    np.testing.assert_allclose(normalized, [[0.5, 0.5, 0]])
+
+def test_single_group():
+    normalized = normalize_and_compare([[0.3, 0], [0, 0.3]], [[True, False], [False, True]], [1, 1], [False, True])
+    # The unlocked group gets all the weight, the locked one is left alone
+    np.testing.assert_allclose(normalized, [[1, 0], [0, 0.3]])
+
+def test_single_deform_group_among_other_groups():
+    # A vertex in one deform group and one other group is normalized the regular way, which also gives the deform group all the weight
+    normalized = normalize_and_compare([[0.3, 0]], [[True, False]], [2], [False, False])
+    np.testing.assert_allclose(normalized, [[1, 0]])
+
+def test_unlocked_total_zero():
+    # Nothing to scale: every weight is left alone
+    normalized = normalize_and_compare([[0.3, 0, 0]], [[True, True, True]], [3], [True, False, False])
+    np.testing.assert_allclose(normalized, [[0.3, 0, 0]])
+
+def test_second_pass_nothing_locked():
+    normalized = normalize_and_compare([[0.2, 0.2, 0.1], [0.5, 0.25, 0.25]], [[True, True, True], [True, True, True]], [3, 3], [False, False, False])
+    np.testing.assert_allclose(normalized, [[0.4, 0.4, 0.2], [0.5, 0.25, 0.25]], atol=1e-6)
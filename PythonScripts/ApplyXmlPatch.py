@@ -0,0 +1,29 @@
+import argparse
+import sys
+from pathlib import Path
+from XmlUtils import read_patched_xml, write_xml_pretty
+
+# Applies delta patches (written to patches/xmlpatch by SetupNewModOutfit.py and ClassOutfitReplacer.py with deltaPatches = True)
+# to their base file, and writes the result as a full XML file in the same format as the game's XML files
+# Cobalt only loads full XML files, so this has to be run before a mod built with delta patches can be played.
+# Several patches of the same base file can be applied at once, ex. to merge the AssetTable.xml of two mods.
+#
+# Usage: python ApplyXmlPatch.py <base XML> <output XML> <patch>...
+# Example:
+#   python ApplyXmlPatch.py ./BaseXml/base_AssetTable.xml .../SkimpyClassOutfitsT1/patches/xml/AssetTable.xml .../SkimpyClassOutfitsT1/patches/xmlpatch/AssetTable.xmlpatch
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Applies delta patches to their base XML file")
+    parser.add_argument("base", help="Path to the base XML file the patches were made from")
+    parser.add_argument("output", help="Path of the full XML file to write")
+    parser.add_argument("patches", nargs="+", help="Delta patches to apply, in order")
+    args = parser.parse_args()
+
+    try:
+        xmlDoc = read_patched_xml(args.base, args.patches)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
+    # The mod's patches/xml folder doesn't exist yet if it was built with delta patches only
+    Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+    write_xml_pretty(xmlDoc, args.output)
@@ -0,0 +1,364 @@
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from PIL import Image
+import ClassOutfitReplacer
+import EngageNormal
+import SetupNewModOutfit
+import SplitMulti
+from SetupNewModOutfit import OutfitData
+from TextureUtils import load_rgba_array, remap_texture, save_image, defaultTilePixels
+from XmlUtils import SheetOverlay, read_sheet_schema, write_xml_pretty
+
+# Benchmarks for the PythonScripts tools
+# Usage:
+#   python Benchmark.py split_multi [--sizes 1024 2048 4096]
+#   python Benchmark.py texture_memory [--sizes 1024 2048 4096 8192] [--tile-pixels 262144]
+#   python Benchmark.py class_outfit_replacer [--asset-table path] [--counts 10 50 100 200 500]
+#   python Benchmark.py suite [--rows 1000 10000] [--texture-sizes 1024 2048] [--outfits 20] [--replacements 50] [--repeat 3] [--output path]
+
+# Base Asset Table used by default (and for the columns of the synthetic Asset Tables)
+baseAssetTablePath = "./BaseXml/base_AssetTable_NoDebug.xml"
+
+# Reference implementation of the original per-pixel SplitMulti.py so that the new array engine can be compared against it
+def split_multi_per_pixel(src):
+    outname = os.path.splitext(src)[0]
+    img = Image.open(src).convert("RGBA")
+    data = img.getdata()
+    r = [(d[0], d[0], d[0]) for d in data]
+    g = [(d[1], d[1], d[1]) for d in data]
+    b = [(d[2], d[2], d[2]) for d in data]
+    a = [(d[3], d[3], d[3]) for d in data]
+    img.putdata(r)
+    img.save(outname + '_R.png', format="PNG")
+    img.putdata(g)
+    img.save(outname + '_M.png', format="PNG")
+    img.putdata(b)
+    img.save(outname + '_AO.png', format="PNG")
+    img.putdata(a)
+    img.save(outname + '_Mask.png', format="PNG")
+
+# Creates a random RGBA texture of size x size pixels and returns its path
+def create_synthetic_texture(folder, size):
+    rng = np.random.default_rng(size)
+    pixels = rng.integers(0, 256, (size, size, 4), dtype=np.uint8)
+    path = os.path.join(folder, f"synthetic_{size}.png")
+    Image.fromarray(pixels).save(path, format="PNG")
+    return path
+
+def time_call(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+# Total size in bytes of the SplitMulti outputs of src
+def get_split_multi_output_size(src):
+    return sum(os.path.getsize(remap.get_output_path(src)) for remap in SplitMulti.multiRemaps)
+
+def benchmark_split_multi(sizes):
+    print(f"{'Size':>6} {'Per-pixel (s)':>14} {'1 thread (s)':>13} {'Threaded (s)':>13} {'Speedup':>8} {'Per-pixel (MB)':>15} {'Array (MB)':>11}")
+    with tempfile.TemporaryDirectory() as folder:
+        for size in sizes:
+            src = create_synthetic_texture(folder, size)
+            perPixelTime = time_call(split_multi_per_pixel, src)
+            perPixelSize = get_split_multi_output_size(src)
+            singleThreadTime = time_call(remap_texture, src, SplitMulti.multiRemaps, None, 1)
+            threadedTime = time_call(SplitMulti.split_multi, src)
+            arraySize = get_split_multi_output_size(src)
+            print(f"{size:>6} {perPixelTime:>14.2f} {singleThreadTime:>13.2f} {threadedTime:>13.2f} {perPixelTime / threadedTime:>7.1f}x "
+                  f"{perPixelSize / 1e6:>15.1f} {arraySize / 1e6:>11.1f}")
+
+# Peak resident memory (RSS) of the current process, in bytes
+def get_peak_rss():
+    if sys.platform == 'win32':
+        import ctypes
+        from ctypes import wintypes
+
+        class ProcessMemoryCounters(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD)] + \
+                [(name, ctypes.c_size_t) for name in ('PeakWorkingSetSize', 'WorkingSetSize', 'QuotaPeakPagedPoolUsage', 'QuotaPagedPoolUsage',
+                                                      'QuotaPeakNonPagedPoolUsage', 'QuotaNonPagedPoolUsage', 'PagefileUsage', 'PeakPagefileUsage')]
+
+        counters = ProcessMemoryCounters()
+        counters.cb = ctypes.sizeof(counters)
+        ctypes.windll.psapi.GetProcessMemoryInfo(ctypes.windll.kernel32.GetCurrentProcess(), ctypes.byref(counters), counters.cb)
+        return counters.PeakWorkingSetSize
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in KB elsewhere
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def _measure_call(func, args):
+    # Runs in a fresh worker process. Returns (result, elapsed seconds, peak RSS)
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start, get_peak_rss()
+
+# Returns (result, elapsed seconds, peak memory in bytes) of func(*args), run in a fresh process
+# The peak RSS counts every allocation, including the buffers PIL and zlib allocate internally (which tracemalloc can't see).
+# It includes the interpreter and the imported modules: compare it with the peak of a call that does nothing (see benchmark_texture_memory()).
+# Note: on Linux, a new process starts with the peak RSS of the process that launched it, so keep large allocations
+# out of this process too (ex. create the inputs with measure_call() as well).
+def measure_call(func, *args):
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+        return executor.submit(_measure_call, func, args).result()
+
+def benchmark_texture_memory(sizes, tilePixels):
+    _, _, baseline = measure_call(time.sleep, 0)
+    print(f"SplitMulti outputs, whole image vs. strips of {tilePixels} pixels")
+    print(f"Peak RSS of a fresh process. Baseline (a call that does nothing): {baseline / 1e6:.1f} MB")
+    print(f"{'Size':>6} {'Whole (MB)':>11} {'Whole (s)':>10} {'Tiled (MB)':>11} {'Tiled (s)':>10}")
+    with tempfile.TemporaryDirectory() as folder:
+        for size in sizes:
+            src, _, _ = measure_call(create_synthetic_texture, folder, size)
+            _, wholeTime, wholePeak = measure_call(remap_texture, src, SplitMulti.multiRemaps)
+            _, tiledTime, tiledPeak = measure_call(remap_texture, src, SplitMulti.multiRemaps, tilePixels)
+            print(f"{size:>6} {wholePeak / 1e6:>11.1f} {wholeTime:>10.2f} {tiledPeak / 1e6:>11.1f} {tiledTime:>10.2f}")
+
+# Reference implementation of the original ClassOutfitReplacer.py loop, which runs two findall() scans of the table per model code
+def replace_class_outfits_findall(data, replacements):
+    for oldModelCodeBase, oldModelCodeExts, newModelCode, bIncludeOBody in replacements:
+        for oldModelCodeExt in oldModelCodeExts:
+            oldModelCode = f"{oldModelCodeBase}_{oldModelCodeExt}"
+            results = data.findall(f"Param[@DressModel='uBody_{oldModelCode}']")
+            for row in filter(lambda x: "デバッグ用;" not in x.get("Conditions"), results):
+                row.set("DressModel", f"uBody_{newModelCode}")
+            if bIncludeOBody:
+                for row in data.findall(f"Param[@BodyModel='oBody_{oldModelCode}']"):
+                    row.set("BodyModel", f"oBody_{newModelCode}")
+
+# Builds a replacement list of the requested length from the uBody models that actually appear in the table
+def create_synthetic_replacements(data, count):
+    modelCodes = sorted({row.get("DressModel")[len("uBody_"):] for row in data if row.get("DressModel", "").startswith("uBody_")})
+    replacements = []
+    for i, modelCode in enumerate(modelCodes[:count]):
+        base, _, ext = modelCode.partition("_")
+        replacements.append((base, [ext], f"Bench0AF_c{i:03}", True))
+    return replacements
+
+def time_replacer(replacer, assetTablePath, replacements):
+    data = ET.parse(assetTablePath).getroot().find("Sheet/Data")
+    # The replacer prints a line (and possibly a warning) per model code, which would drown out the results
+    with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        return time_call(replacer, data, replacements)
+
+def benchmark_class_outfit_replacer(assetTablePath, counts):
+    data = ET.parse(assetTablePath).getroot().find("Sheet/Data")
+    print(f"{len(data)} rows in {assetTablePath}")
+    print(f"{'Replacements':>12} {'findall (s)':>12} {'Indexed (s)':>12} {'Speedup':>8}")
+    for count in counts:
+        replacements = create_synthetic_replacements(data, count)
+        findallTime = time_replacer(replace_class_outfits_findall, assetTablePath, replacements)
+        indexedTime = time_replacer(ClassOutfitReplacer.replace_class_outfits, assetTablePath, replacements)
+        print(f"{len(replacements):>12} {findallTime:>12.3f} {indexedTime:>12.3f} {findallTime / indexedTime:>7.1f}x")
+
+# Benchmark Suite
+# Runs every tool, stage by stage, on synthetic inputs of configurable size, and writes the timings as JSON so that
+# results can be compared across versions:
+#   SetupNewModOutfit (AssetTable, Item and Shop): parse, transform, serialize
+#   ClassOutfitReplacer: parse, transform, serialize
+#   SplitMulti and EngageNormal: decode, transform, encode
+# Each stage time is the best of several runs.
+
+# Writes a Book of the given sheets, as (sheetName, schema, rows) with rows a list of attribute dicts, in the format of the base XML files
+# The <Header> has the columns and defaults of schema (a SheetSchema), or the attributes of the first row (with no defaults) if it is None.
+def write_synthetic_book(filePath, sheets):
+    book = ET.Element('Book', {'Count': str(len(sheets))})
+    for sheetName, schema, rows in sheets:
+        sheet = ET.SubElement(book, 'Sheet', {'Name': sheetName, 'Count': str(len(rows))})
+        header = ET.SubElement(sheet, 'Header')
+        columns = schema.columns if schema is not None else list(rows[0] if rows else {})
+        defaults = schema.defaults if schema is not None else [''] * len(columns)
+        for column, default in zip(columns, defaults):
+            ET.SubElement(header, 'Param', {'Name': column, 'Ident': column, 'Type': 'string', 'Min': default, 'Max': '', 'Chg': ''})
+        data = ET.SubElement(sheet, 'Data')
+        for row in rows:
+            ET.SubElement(data, 'Param', row)
+    write_xml_pretty(ET.ElementTree(book), filePath)
+    return filePath
+
+# Asset Table with rowCount rows and the columns of the base Asset Table. Model codes repeat every few rows, like the alternate
+# versions of a model in the base file.
+def create_synthetic_asset_table(folder, rowCount):
+    schema = read_sheet_schema(baseAssetTablePath)
+    rows = []
+    for i in range(rowCount):
+        modelCode = f"Syn{i // 8:04}AF_c{i % 4:03}"
+        if i % 2 == 0:
+            overrides = {'Mode': '2', 'Conditions': f"PID_Syn{i // 8};女装;" + ("デバッグ用;" if i % 50 == 0 else ""), 'DressModel': f"uBody_{modelCode}"}
+        else:
+            overrides = {'Mode': '1', 'Conditions': f"PID_Syn{i // 8};女装;", 'BodyModel': f"oBody_{modelCode}"}
+        rows.append(SetupNewModOutfit.create_asset_table_element(schema, overrides).attrib)
+    return write_synthetic_book(os.path.join(folder, f"AssetTable_{rowCount}.xml"), [('アセット', schema, rows)])
+
+# Item table with rowCount accessories
+def create_synthetic_item(folder, rowCount):
+    rows = [SetupNewModOutfit.create_item_xml_element(OutfitData(f"Syn0AF_c{i:03}", id=f"Syn{i}")).attrib for i in range(rowCount)]
+    return write_synthetic_book(os.path.join(folder, f"Item_{rowCount}.xml"), [('アクセサリ', None, rows)])
+
+# Accessories Shop with rowCount rows, with a chapter marker (M005, M006, etc.) every 10 rows
+def create_synthetic_shop(folder, rowCount):
+    rows = []
+    for i in range(rowCount):
+        if i % 10 == 0:
+            rows.append({'Condition': f"M{5 + i // 10:03}", 'Aid': ''})
+        else:
+            rows.append({'Condition': '', 'Aid': f"AID_Syn{i}"})
+    return write_synthetic_book(os.path.join(folder, f"Shop_{rowCount}.xml"), [('アクセサリー屋', None, rows)])
+
+def create_synthetic_setup_data(count):
+    return [OutfitData(f"Bench0AF_c{i:03}", id=f"Bench{i}", name=f"Bench {i}", description=f"Benchmark outfit {i}") for i in range(count)]
+
+# Runs each stage in order, repeat times, and returns the best time of each stage
+#   stages is a list of (name, func) where func takes the result of the previous stage (None for the first one)
+def time_stages(stages, repeat):
+    best = {}
+    for _ in range(repeat):
+        result = None
+        for name, func in stages:
+            start = time.perf_counter()
+            result = func(result)
+            elapsed = time.perf_counter() - start
+            best[name] = min(best.get(name, elapsed), elapsed)
+    return best
+
+def benchmark_setup_new_mod_outfit(folder, rowCount, outfitCount, repeat):
+    setupData = create_synthetic_setup_data(outfitCount)
+    outputPath = os.path.join(folder, "output.xml")
+
+    # transform returns the rows to append while serializing (see write_xml_pretty()), or None if it modifies the tree directly
+    def stages(inputPath, transform):
+        return [
+            ('parse', lambda _: ET.parse(inputPath)),
+            ('transform', lambda xmlDoc: (xmlDoc, transform(xmlDoc))),
+            ('serialize', lambda result: write_xml_pretty(result[0], outputPath, result[1])),
+        ]
+
+    inputs = [
+        ('AssetTable', create_synthetic_asset_table(folder, rowCount), lambda xmlDoc: SetupNewModOutfit.add_asset_table_rows(xmlDoc, setupData)),
+        ('Item', create_synthetic_item(folder, rowCount), lambda xmlDoc: SetupNewModOutfit.add_item_rows(xmlDoc, setupData)),
+        ('Shop', create_synthetic_shop(folder, rowCount), lambda xmlDoc: SetupNewModOutfit.add_shop_rows(xmlDoc, setupData)),
+    ]
+    return [{'tool': 'SetupNewModOutfit', 'input': name, 'rows': rowCount, 'outfits': outfitCount,
+             'stages': time_stages(stages(inputPath, transform), repeat)} for name, inputPath, transform in inputs]
+
+def benchmark_class_outfit_replacer_stages(folder, rowCount, replacementCount, repeat):
+    inputPath = create_synthetic_asset_table(folder, rowCount)
+    replacements = create_synthetic_replacements(ET.parse(inputPath).getroot().find("Sheet/Data"), replacementCount)
+    outputPath = os.path.join(folder, "output.xml")
+
+    def transform(xmlDoc):
+        overlay = SheetOverlay(xmlDoc)
+        # The replacer prints a line (and possibly a warning) per model code
+        with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            ClassOutfitReplacer.replace_class_outfits(overlay.data, replacements, overlay)
+        return overlay
+
+    stages = [
+        ('parse', lambda _: ET.parse(inputPath)),
+        ('transform', transform),
+        ('serialize', lambda overlay: overlay.write(outputPath)),
+    ]
+    return [{'tool': 'ClassOutfitReplacer', 'input': 'AssetTable', 'rows': rowCount, 'replacements': len(replacements),
+             'stages': time_stages(stages, repeat)}]
+
+def benchmark_texture_stages(folder, size, repeat):
+    src = create_synthetic_texture(folder, size)
+    results = []
+    for tool, remaps in (('SplitMulti', SplitMulti.multiRemaps), ('EngageNormal', EngageNormal.normalMapRemaps)):
+        # Write the outputs next to a copy of the source, so that in-place conversions don't change the source between runs
+        outputBase = os.path.join(folder, f"{tool}_{size}.png")
+
+        def encode(outputs):
+            for remap, pixels in outputs:
+                save_image(pixels, remap.get_output_path(outputBase))
+
+        stages = [
+            ('decode', lambda _: load_rgba_array(src)),
+            # ascontiguousarray so that the copy of single-channel views is counted here and not in the encode stage
+            ('transform', lambda pixels: [(remap, np.ascontiguousarray(remap.apply(pixels))) for remap in remaps]),
+            ('encode', encode),
+        ]
+        results.append({'tool': tool, 'input': 'texture', 'size': size, 'outputs': len(remaps), 'stages': time_stages(stages, repeat)})
+    return results
+
+def get_git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_benchmark_suite(rowCounts, textureSizes, outfitCount, replacementCount, repeat, outputPath):
+    results = []
+    with tempfile.TemporaryDirectory() as folder:
+        for rowCount in rowCounts:
+            results += benchmark_setup_new_mod_outfit(folder, rowCount, outfitCount, repeat)
+            results += benchmark_class_outfit_replacer_stages(folder, rowCount, replacementCount, repeat)
+        for size in textureSizes:
+            results += benchmark_texture_stages(folder, size, repeat)
+
+    print(f"{'Tool':<20} {'Input':<11} {'Size':>7}  Stages (s)")
+    for result in results:
+        stageTimes = '  '.join(f"{name} {elapsed:.3f}" for name, elapsed in result['stages'].items())
+        print(f"{result['tool']:<20} {result['input']:<11} {result.get('rows', result.get('size')):>7}  {stageTimes}  (total {sum(result['stages'].values()):.3f})")
+
+    report = {
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'commit': get_git_commit(),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'parameters': {'rows': rowCounts, 'textureSizes': textureSizes, 'outfits': outfitCount, 'replacements': replacementCount, 'repeat': repeat},
+        'results': results,
+    }
+    with open(outputPath, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=4, ensure_ascii=False)
+    print(f"Results written to {outputPath}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmarks for the PythonScripts tools")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    splitMultiParser = subparsers.add_parser("split_multi", help="Per-pixel vs. array SplitMulti (sequential and threaded encoding) on synthetic textures")
+    splitMultiParser.add_argument("--sizes", type=int, nargs="+", default=[1024, 2048, 4096], help="Texture sizes (in pixels) to test")
+
+    textureMemoryParser = subparsers.add_parser("texture_memory", help="Peak memory of whole-image vs. tiled texture processing as the resolution grows")
+    textureMemoryParser.add_argument("--sizes", type=int, nargs="+", default=[1024, 2048, 4096, 8192], help="Texture sizes (in pixels) to test")
+    textureMemoryParser.add_argument("--tile-pixels", type=int, default=defaultTilePixels, help="Pixels per strip in tiled mode")
+
+    classOutfitReplacerParser = subparsers.add_parser("class_outfit_replacer", help="findall() vs. indexed ClassOutfitReplacer as the replacement list grows")
+    classOutfitReplacerParser.add_argument("--asset-table", default=baseAssetTablePath, help="Path to the Asset Table XML to run against")
+    classOutfitReplacerParser.add_argument("--counts", type=int, nargs="+", default=[10, 50, 100, 200, 500], help="Lengths of the replacement list to test")
+
+    suiteParser = subparsers.add_parser("suite", help="Stage timings of every tool on synthetic XML and textures, written as JSON")
+    suiteParser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000], help="Row counts of the synthetic AssetTable, Item and Shop XML")
+    suiteParser.add_argument("--texture-sizes", type=int, nargs="+", default=[1024, 2048], help="Synthetic texture sizes (in pixels)")
+    suiteParser.add_argument("--outfits", type=int, default=20, help="Number of outfits added by SetupNewModOutfit")
+    suiteParser.add_argument("--replacements", type=int, default=50, help="Number of model codes replaced by ClassOutfitReplacer")
+    suiteParser.add_argument("--repeat", type=int, default=3, help="Number of runs of each benchmark. The best time of each stage is kept.")
+    suiteParser.add_argument("--output", default="benchmark_results.json", help="Path of the JSON results file")
+
+    args = parser.parse_args()
+    if args.benchmark == "split_multi":
+        benchmark_split_multi(args.sizes)
+    elif args.benchmark == "texture_memory":
+        benchmark_texture_memory(args.sizes, args.tile_pixels)
+    elif args.benchmark == "class_outfit_replacer":
+        benchmark_class_outfit_replacer(args.asset_table, args.counts)
+    elif args.benchmark == "suite":
+        run_benchmark_suite(args.rows, args.texture_sizes, args.outfits, args.replacements, args.repeat, args.output)
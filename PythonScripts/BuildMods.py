@@ -0,0 +1,122 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import pickle
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from XmlUtils import parse_xml_cached
+import ClassOutfitReplacer
+import SetupNewModOutfit
+from SetupNewModOutfit import OutfitData
+
+# Builds many mod folders in one run from a JSON manifest
+# The base XML files are parsed once, and every mod is built from copies of those shared trees on a pool of worker processes.
+#
+# Usage: python BuildMods.py <manifest.json> [--workers N]
+# Run it from the PythonScripts folder, the same way as SetupNewModOutfit.py and ClassOutfitReplacer.py (base files are read from ./BaseXml)
+#
+# Manifest format:
+# {
+#     "mods": [
+#         {
+#             "type": "SetupNewModOutfit",
+#             "modFolder": "path/to/SkimpyClassOutfitsT1",
+#             "outfits": [
+#                 { "bundle_code": "Lev0AF_c100", "id": "SkimpyThiefT1", "name": "Thief", "description": "...", "include_obody": true, "shop_chapter": 5 },
+#                 ...
+#             ]
+#         },
+#         {
+#             "type": "ClassOutfitReplacer",
+#             "modFolder": "path/to/SkimpyClassOutfitsT1_OverrideClasses",
+#             "replacements": [
+#                 ["Dge0AF", ["c000", "c699", "c699d"], "Lev0AF_c100", true],
+#                 ...
+#             ]
+#         }
+#     ]
+# }
+# "outfits" entries take the same arguments as OutfitData, and "replacements" entries are the same as replacementsData in ClassOutfitReplacer.py.
+# A mod can also have a "name" used in the report. By default, the mod folder is used.
+
+# Base trees shared by every mod built in this worker process. Set once per worker by init_worker().
+sharedBaseXmlDocs = None
+
+def init_worker(baseXmlDocsPickle):
+    global sharedBaseXmlDocs
+    sharedBaseXmlDocs = pickle.loads(baseXmlDocsPickle)
+
+def load_manifest(manifestPath):
+    with open(manifestPath, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    mods = manifest['mods']
+    for mod in mods:
+        if mod.get('type') not in ('SetupNewModOutfit', 'ClassOutfitReplacer'):
+            raise ValueError(f"Unknown mod type {mod.get('type')!r} for mod {get_mod_name(mod)}!")
+    return mods
+
+def get_mod_name(mod):
+    return mod.get('name') or mod.get('modFolder') or '(current directory)'
+
+def build_mod(mod):
+    if mod['type'] == 'SetupNewModOutfit':
+        setupData = [OutfitData(**outfit) for outfit in mod['outfits']]
+        # Mods are already built in parallel, so the outputs of each mod are built one after another
+        SetupNewModOutfit.build_mod(setupData, mod.get('modFolder'), sharedBaseXmlDocs, parallel=False)
+    else:
+        replacements = [tuple(replacement) for replacement in mod['replacements']]
+        # ClassOutfitReplacer keeps its changes in an overlay, so it can use the shared tree directly
+        ClassOutfitReplacer.build_mod(replacements, mod.get('modFolder'), sharedBaseXmlDocs['AssetTable'])
+
+def run_mod(mod):
+    # Runs in a worker process. Output is captured so that the logs of mods built at the same time don't get mixed up.
+    log = io.StringIO()
+    error = None
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        try:
+            build_mod(mod)
+        except Exception:
+            error = traceback.format_exc()
+    return get_mod_name(mod), time.perf_counter() - start, log.getvalue(), error
+
+def build_mods(mods, maxWorkers=None):
+    start = time.perf_counter()
+    # Parse each base file once. Workers receive them a single time, when the worker starts.
+    baseXmlDocs = {
+        'AssetTable': parse_xml_cached(SetupNewModOutfit.baseAssetTableXmlPath),
+        'Item': parse_xml_cached(SetupNewModOutfit.baseItemXmlPath),
+        'Shop': parse_xml_cached(SetupNewModOutfit.baseShopXmlPath),
+    }
+    baseXmlDocsPickle = pickle.dumps(baseXmlDocs, protocol=pickle.HIGHEST_PROTOCOL)
+    print(f"Parsed base XML files in {time.perf_counter() - start:.2f}s")
+
+    failures = []
+    with ProcessPoolExecutor(max_workers=maxWorkers or os.cpu_count(), initializer=init_worker, initargs=(baseXmlDocsPickle,)) as executor:
+        futures = [executor.submit(run_mod, mod) for mod in mods]
+        for future in as_completed(futures):
+            name, elapsed, log, error = future.result()
+            print(f"=== {name} : {'FAILED' if error else 'done'} in {elapsed:.2f}s")
+            if log:
+                print(log, end='' if log.endswith('\n') else '\n')
+            if error:
+                print(error)
+                failures.append(name)
+
+    print(f"Built {len(mods) - len(failures)}/{len(mods)} mods in {time.perf_counter() - start:.2f}s")
+    if failures:
+        print(f"Failed mods: {', '.join(failures)}")
+    return failures
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Builds many mod folders from a JSON manifest")
+    parser.add_argument("manifest", help="Path to the JSON manifest listing the mods to build")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: one per core)")
+    args = parser.parse_args()
+
+    failures = build_mods(load_manifest(args.manifest), args.workers)
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,143 @@
+import hashlib
+import json
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from XmlUtils import hash_file
+from ProfileUtils import stage
+
+# Helpers for incremental builds of mod outputs
+# Each output is generated from a set of inputs (base XML hashes, the parts of setupData it uses, etc.).
+# A fingerprint of those inputs is recorded in a build state file, one per output folder, kept outside of it (ex. in
+# PythonScripts/.buildstate/<folder name>-<hash of the folder path>.json, see get_build_state_path()). On the next run, an output
+# whose fingerprint is unchanged (and whose file was not modified since) is skipped entirely.
+
+# Hash of any JSON-serializable description of an output's inputs
+def fingerprint(*parts):
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+# Path of the build state file of the outputs in outputFolder, kept in stateFolder (one file per output folder)
+# The state stays out of the output folder, so it is not shipped along with the outputs (ex. in a mod folder).
+def get_build_state_path(stateFolder, outputFolder):
+    outputFolder = Path(outputFolder).resolve()
+    folderHash = hashlib.sha256(str(outputFolder).encode('utf-8')).hexdigest()[:16]
+    return Path(stateFolder) / f"{outputFolder.name or 'root'}-{folderHash}.json"
+
+class BuildState:
+    def __init__(self, statePath):
+        self.statePath = Path(statePath)
+        # Output path -> {"fingerprint": inputs fingerprint, "hash": hash of the output file when it was written}
+        try:
+            with open(self.statePath, 'r', encoding='utf-8') as f:
+                self.outputs = json.load(f)
+        except (OSError, ValueError):
+            self.outputs = {}
+
+    # An output is up to date if it was built from the same inputs and the file is still the one we wrote
+    def is_up_to_date(self, outputPath, inputsFingerprint):
+        entry = self.outputs.get(str(outputPath))
+        if entry is None or entry['fingerprint'] != inputsFingerprint:
+            return False
+        return Path(outputPath).exists() and hash_file(outputPath) == entry['hash']
+
+    def record(self, outputPath, inputsFingerprint):
+        self.outputs[str(outputPath)] = {'fingerprint': inputsFingerprint, 'hash': hash_file(outputPath)}
+
+    def save(self):
+        self.statePath.parent.mkdir(parents=True, exist_ok=True)
+        write_text_atomic(self.statePath, json.dumps(self.outputs, indent=4, sort_keys=True))
+
+# Returns a temporary path next to filePath to generate an output into. Pass it to commit_output() when done.
+def get_temp_output_path(filePath):
+    filePath = Path(filePath)
+    return filePath.with_name(f".{filePath.name}.tmp")
+
+# Moves a generated temporary file into place. The rename is atomic, so readers never see a half-written output.
+# If the existing file already has exactly the same content, it is left untouched (no write, no sync upload).
+# Returns True if filePath was written.
+def commit_output(tempPath, filePath):
+    if Path(filePath).exists() and hash_file(filePath) == hash_file(tempPath):
+        os.remove(tempPath)
+        return False
+    os.replace(tempPath, filePath)
+    return True
+
+def write_text_atomic(filePath, text):
+    tempPath = get_temp_output_path(filePath)
+    with open(tempPath, 'w', encoding='utf-8') as f:
+        f.write(text)
+    return commit_output(tempPath, filePath)
+
+# Builds each output whose inputs changed and prints a report of what was rebuilt and what was skipped
+#   outputs is a list of (outputPath, inputsFingerprint, build) where build(tempPath) generates the output into tempPath
+#   If buildState is None, every output is rebuilt (but still written atomically and only if its content changed)
+#   If parallel is True, each output is built on its own worker process, so build must be picklable (ex. a module-level
+#   function or a functools.partial of one, not a lambda). Every output is attempted, and the failures are reported together
+#   by a single exception at the end.
+def build_outputs(outputs, buildState=None, parallel=False):
+    report = []
+    pendingOutputs = []
+    for outputPath, inputsFingerprint, build in outputs:
+        if buildState is not None and buildState.is_up_to_date(outputPath, inputsFingerprint):
+            report.append((outputPath, 'skipped (inputs unchanged)'))
+        else:
+            pendingOutputs.append((outputPath, inputsFingerprint, build))
+
+    failures = []
+    try:
+        if parallel and len(pendingOutputs) > 1:
+            with ProcessPoolExecutor(max_workers=min(len(pendingOutputs), os.cpu_count())) as executor:
+                futures = [(outputPath, inputsFingerprint, executor.submit(_build_output, build, outputPath))
+                           for outputPath, inputsFingerprint, build in pendingOutputs]
+                for outputPath, inputsFingerprint, future in futures:
+                    elapsed, error = future.result()
+                    if error is None:
+                        commit_built_output(outputPath, inputsFingerprint, buildState, report, f" in {elapsed:.2f}s")
+                    else:
+                        failures.append((outputPath, error))
+                        report.append((outputPath, f"FAILED after {elapsed:.2f}s"))
+        else:
+            for outputPath, inputsFingerprint, build in pendingOutputs:
+                with stage(Path(outputPath).name):
+                    build_to_temp(build, outputPath)
+                commit_built_output(outputPath, inputsFingerprint, buildState, report)
+    finally:
+        # Record the outputs built so far, even if a later one failed
+        if buildState is not None:
+            buildState.save()
+
+    for outputPath, status in report:
+        print(f"{outputPath} : {status}")
+    if failures:
+        raise RuntimeError(f"{len(failures)} output(s) failed to build:\n" + '\n'.join(f"{outputPath}:\n{error}" for outputPath, error in failures))
+    return report
+
+# Builds an output into its temporary path. The temporary file is removed if the build fails.
+def build_to_temp(build, outputPath):
+    tempPath = get_temp_output_path(outputPath)
+    tempPath.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        build(tempPath)
+    except BaseException:
+        if tempPath.exists():
+            os.remove(tempPath)
+        raise
+
+def _build_output(build, outputPath):
+    # Runs build_to_temp() in a worker process and reports (elapsed seconds, error traceback or None)
+    # Errors are returned instead of raised so that the other outputs still get built
+    start = time.perf_counter()
+    try:
+        build_to_temp(build, outputPath)
+        error = None
+    except Exception:
+        error = traceback.format_exc()
+    return time.perf_counter() - start, error
+
+def commit_built_output(outputPath, inputsFingerprint, buildState, report, details=''):
+    written = commit_output(get_temp_output_path(outputPath), outputPath)
+    report.append((outputPath, ('rebuilt' if written else 'rebuilt (content identical, not rewritten)') + details))
+    if buildState is not None:
+        buildState.record(outputPath, inputsFingerprint)
@@ -1,6 +1,8 @@
-import xml.etree.ElementTree as ET
 import warnings
+from collections import Counter
 from pathlib import Path
+from XmlUtils import AttributeIndex, SheetOverlay, diff_sheet_streaming, parse_xml_cached, rewrite_sheet_streaming, write_xml_patch
+from ProfileUtils import profile_session, stage
 
 # Inputs
 replaceUniqueClassModels = False  # Set to true if you want to replace character specific unique class models (ex. Archer for Etie, Thief for Yunaka, etc.))
@@ -34,23 +36,50 @@ replacementsData = [
     ('Bow1AF', ['c000', 'c699'], 'Lev0AF_c120', True),
 ]
 
-if replaceUniqueClassModels:
-    replacementsData += [
-        ('Dge0AF', ['c253'], 'Lev0AF_c100', True),  # Yunaka (Thief)
-        ('Amr0AF', ['c250'], 'Lev0AF_c101', True),  # Jade (Axe Armor)
-        ('Amr1AF', ['c554', 'c554b'], 'Lev0AF_c102', True),  # Marni and Madeline (General)
-        ('Wng0EF', ['c153'], 'Lev0AF_c104', True),  # Chloe (Lance Flier)
-        ('Wng2DF', ['c303', 'c451'], 'Lev0AF_c106', True),  # Rosado and Seforia (Wyvern Knight)
-        ('Mag0AF', ['c252'], 'Lev0AF_c107', True),  # Citrinne (Mage)
-        ('Swd0AF', ['c251'], 'Lev0AF_c110', True),  # Lapis (Sword Fighter)
-        ('Swd2AF', ['c352'], 'Lev0AF_c112', True),  # Goldmary (Hero)
-        ('Axe0AF', ['c552'], 'Lev0AF_c113', True),  # Anna (Axe Fighter)
-        ('Axe1AF', ['c453'], 'Lev0AF_c114', True),  # Panette (Berserker)
-        ('Axe2AF', ['c254'], 'Lev0AF_c115', True),  # Saphir (Warrior)
-        ('Rod0AF', ['c550'], 'Lev0AF_c116', True),  # Framme (Martial Monk)
-        ('Rod2AF', ['c151'], 'Lev0AF_c118', True),  # Eve (High Priest)
-        ('Bow0AF', ['c152'], 'Lev0AF_c119', True),  # Etie (Archer)
-    ]
+# Character specific unique class models. These are only replaced if replaceUniqueClassModels is True.
+uniqueClassModelReplacementsData = [
+    ('Dge0AF', ['c253'], 'Lev0AF_c100', True),  # Yunaka (Thief)
+    ('Amr0AF', ['c250'], 'Lev0AF_c101', True),  # Jade (Axe Armor)
+    ('Amr1AF', ['c554', 'c554b'], 'Lev0AF_c102', True),  # Marni and Madeline (General)
+    ('Wng0EF', ['c153'], 'Lev0AF_c104', True),  # Chloe (Lance Flier)
+    ('Wng2DF', ['c303', 'c451'], 'Lev0AF_c106', True),  # Rosado and Seforia (Wyvern Knight)
+    ('Mag0AF', ['c252'], 'Lev0AF_c107', True),  # Citrinne (Mage)
+    ('Swd0AF', ['c251'], 'Lev0AF_c110', True),  # Lapis (Sword Fighter)
+    ('Swd2AF', ['c352'], 'Lev0AF_c112', True),  # Goldmary (Hero)
+    ('Axe0AF', ['c552'], 'Lev0AF_c113', True),  # Anna (Axe Fighter)
+    ('Axe1AF', ['c453'], 'Lev0AF_c114', True),  # Panette (Berserker)
+    ('Axe2AF', ['c254'], 'Lev0AF_c115', True),  # Saphir (Warrior)
+    ('Rod0AF', ['c550'], 'Lev0AF_c116', True),  # Framme (Martial Monk)
+    ('Rod2AF', ['c151'], 'Lev0AF_c118', True),  # Eve (High Priest)
+    ('Bow0AF', ['c152'], 'Lev0AF_c119', True),  # Etie (Archer)
+]
+
+def get_replacements_data(includeUniqueClassModels):
+    return replacementsData + (uniqueClassModelReplacementsData if includeUniqueClassModels else [])
+
+# To build several variants in one run, list them here as (replaceUniqueClassModels, modFolder) pairs.
+# The base Asset Table is then parsed once and shared by every variant. If empty, the single variant set up by
+# replaceUniqueClassModels and modFolder is built.
+# Example: [(False, ".../SkimpyClassOutfitsT1"), (True, ".../SkimpyClassOutfitsT1_OverrideClasses")]
+variants = []
+
+# If True, the Asset Table is streamed from the base file to the output instead of being loaded as a whole tree.
+# Peak memory then stays about the same no matter how big the base file is, and the base file's formatting is kept as is.
+lowMemoryMode = False
+
+# If True, AssetTable.xml is replaced by a delta patch that only contains the modified attributes of the modified rows (see
+# write_xml_patch() in XmlUtils.py), instead of a full copy of the base file. Its size and write time then depend on the number of
+# rows modified only, and patches from different mods can be applied to the same base file together.
+# Cobalt loads every file of patches/xml as a full XML file, so the patch is written to patches/xmlpatch/AssetTable.xmlpatch
+# instead, and must be applied before the mod can be played, ex.:
+#   python ApplyXmlPatch.py ./BaseXml/base_AssetTable.xml <modFolder>/patches/xml/AssetTable.xml <modFolder>/patches/xmlpatch/AssetTable.xmlpatch
+deltaPatches = False
+
+# If True, the wall time, peak memory and rows of each stage (parse, index, replace, serialize) are printed at the end.
+# If profileDumpPath is set, the run is also profiled with cProfile and the stats are saved there.
+# These can also be enabled with the ENGAGE_PROFILE=1 and ENGAGE_PROFILE_DUMP=<path> environment variables (see ProfileUtils.py).
+profileStages = False
+profileDumpPath = None
 
 # Constants
 baseXmlFolder = './BaseXml'  # Path to the folder that contains the base (original, unmodified) XML files
@@ -61,10 +90,12 @@ modFolder = "C:/Users/Burney/AppData/Roaming/Ryujinx/sdcard/engage/mods/SkimpyCl
 
 # pathlib from Path module lets us use '/' to join paths
 inputAssetTablePath = Path(baseXmlFolder) / './base_AssetTable.xml'
-outputAssetTablePath = Path(modFolder) / 'patches/xml' / 'AssetTable.xml' if modFolder != None else Path('./AssetTable.xml')
 
-xmlDoc = ET.parse(inputAssetTablePath)
-root = xmlDoc.getroot()
+# Path of the generated Asset Table, or of its delta patch if deltaPatches is True
+def get_output_asset_table_path(modFolder):
+    if deltaPatches:
+        return Path(modFolder) / 'patches/xmlpatch' / 'AssetTable.xmlpatch' if modFolder != None else Path('./AssetTable.xmlpatch')
+    return Path(modFolder) / 'patches/xml' / 'AssetTable.xml' if modFolder != None else Path('./AssetTable.xml')
 
 # Asset Table structure is like this:
 # <Book>
@@ -77,40 +108,149 @@ root = xmlDoc.getroot()
 #   </Sheet>
 # </Book>
 
-data = root.find("Sheet/Data")
-
-# Iterate through each replacement entry
-for oldModelCodeBase, oldModelCodeExts, newModelCode, bIncludeOBody in replacementsData:
-    # There might be multiple model codes to replace. Iterate through each old model code
-    for oldModelCodeExt in oldModelCodeExts:
-        oldModelCode = f"{oldModelCodeBase}_{oldModelCodeExt}"
-
-        # Replace uBody model. These models are in the "DressModel" attribute of Param elements.
-        # Find all Param elements with the specified DressModel attribute
-        results = data.findall(f"Param[@DressModel='uBody_{oldModelCode}']")
-        # Filter out results that include Conditions="デバッグ用;"
-        # "デバッグ用" means "debug use" in Japanese. I'm not sure what they are used for, but we'll exclude them.
-        rows = list(filter(lambda x: "デバッグ用;" not in x.get("Conditions"), results))
-        # Iterate through the filtered results and replace the DressModel attribute with the new model code
-        for row in rows:
-            row.set("DressModel", f"uBody_{newModelCode}")
-        print(f"uBody_{oldModelCode} -> uBody_{newModelCode} : {len(rows)} rows modified")
-        if len(rows) == 0:
-            warnings.warn(f"uBody_{oldModelCode} entry not found!")
-
-        # Replace oBody models if option is enabled
-        if bIncludeOBody:
-            # Find all Param elements with the specified BodyModel attribute
-            # Note: I do not observe デバッグ用 entries for oBody models. If that's wrong, then we should filter them
-            rows = data.findall(f"Param[@BodyModel='oBody_{oldModelCode}']")
+# Applies every entry of replacements to the <Data> element of the Asset Table
+# If an overlay is given, the changes are recorded in the overlay and data itself is left untouched
+def replace_class_outfits(data, replacements, overlay=None):
+    # Index the rows by model attribute once instead of scanning every row of the table for each model code
+    with stage('index', rows=len(data)):
+        index = AttributeIndex(data, ['DressModel', 'BodyModel'], overlay=overlay)
+    with stage('replace') as replaceStage:
+        replaceStage.rows = apply_replacements(index, replacements)
+
+# Applies replacements to the rows of index. Returns the number of rows modified.
+def apply_replacements(index, replacements):
+    modifiedRowCount = 0
+
+    # Iterate through each replacement entry
+    for oldModelCodeBase, oldModelCodeExts, newModelCode, bIncludeOBody in replacements:
+        # There might be multiple model codes to replace. Iterate through each old model code
+        for oldModelCodeExt in oldModelCodeExts:
+            oldModelCode = f"{oldModelCodeBase}_{oldModelCodeExt}"
+
+            # Replace uBody model. These models are in the "DressModel" attribute of Param elements.
+            # Find all Param elements with the specified DressModel attribute
+            results = index.find('DressModel', f"uBody_{oldModelCode}")
+            # Filter out results that include Conditions="デバッグ用;"
+            # "デバッグ用" means "debug use" in Japanese. I'm not sure what they are used for, but we'll exclude them.
+            rows = list(filter(lambda x: "デバッグ用;" not in index.get(x, "Conditions"), results))
+            # Iterate through the filtered results and replace the DressModel attribute with the new model code
             for row in rows:
-                row.set("BodyModel", f"oBody_{newModelCode}")
-            print(f"oBody_{oldModelCode} -> oBody_{newModelCode} : {len(rows)} rows modified")
+                index.set(row, "DressModel", f"uBody_{newModelCode}")
+            modifiedRowCount += len(rows)
+            print(f"uBody_{oldModelCode} -> uBody_{newModelCode} : {len(rows)} rows modified")
             if len(rows) == 0:
-                # Note: Just printing instead of warning because it's possible that there's no oBody model for this entry
-                # Example: Thief class has separate uBody models for c000, c699, and c699d, but these share the oBody model for c000
-                print(f"oBody_{oldModelCode} entry not found. This might be expected. Please verify.")
+                warnings.warn(f"uBody_{oldModelCode} entry not found!")
+
+            # Replace oBody models if option is enabled
+            if bIncludeOBody:
+                # Find all Param elements with the specified BodyModel attribute
+                # Note: I do not observe デバッグ用 entries for oBody models. If that's wrong, then we should filter them
+                rows = index.find('BodyModel', f"oBody_{oldModelCode}")
+                for row in rows:
+                    index.set(row, "BodyModel", f"oBody_{newModelCode}")
+                modifiedRowCount += len(rows)
+                print(f"oBody_{oldModelCode} -> oBody_{newModelCode} : {len(rows)} rows modified")
+                if len(rows) == 0:
+                    # Note: Just printing instead of warning because it's possible that there's no oBody model for this entry
+                    # Example: Thief class has separate uBody models for c000, c699, and c699d, but these share the oBody model for c000
+                    print(f"oBody_{oldModelCode} entry not found. This might be expected. Please verify.")
+    return modifiedRowCount
+
+
+# Streaming version of replace_class_outfits(). Rows are patched while the base file is read and written straight to outputPath.
+def stream_class_outfits(inputPath, outputPath, replacements):
+    # Work out the final model code for every old model code up front, since rows can only be visited once.
+    # Replacements are applied in order, so if a later entry replaces a model code that an earlier entry produced,
+    # the earlier entry's rows end up with the later entry's model code (same as replace_class_outfits()).
+    dressModelMap = {}
+    bodyModelMap = {}
+    for oldModelCodeBase, oldModelCodeExts, newModelCode, bIncludeOBody in replacements:
+        for oldModelCodeExt in oldModelCodeExts:
+            oldModelCode = f"{oldModelCodeBase}_{oldModelCodeExt}"
+            add_model_code_replacement(dressModelMap, f"uBody_{oldModelCode}", f"uBody_{newModelCode}")
+            if bIncludeOBody:
+                add_model_code_replacement(bodyModelMap, f"oBody_{oldModelCode}", f"oBody_{newModelCode}")
+
+    # Number of rows modified, keyed by the original model code
+    rowCounts = Counter()
+
+    def update_row(row):
+        dressModel = row.get("DressModel")
+        # Same filter as replace_class_outfits(): skip rows that include Conditions="デバッグ用;"
+        if dressModel in dressModelMap and "デバッグ用;" not in row.get("Conditions"):
+            row.set("DressModel", dressModelMap[dressModel])
+            rowCounts[dressModel] += 1
+        bodyModel = row.get("BodyModel")
+        if bodyModel in bodyModelMap:
+            row.set("BodyModel", bodyModelMap[bodyModel])
+            rowCounts[bodyModel] += 1
+
+    with stage('stream') as streamStage:
+        if deltaPatches:
+            write_xml_patch(outputPath, inputPath, [diff_sheet_streaming(inputPath, update_row)])
+        else:
+            rewrite_sheet_streaming(inputPath, outputPath, updateRow=update_row)
+        streamStage.rows = sum(rowCounts.values())
+
+    # Report the same way as replace_class_outfits(), now that every row has been seen
+    for oldModelCodeBase, oldModelCodeExts, newModelCode, bIncludeOBody in replacements:
+        for oldModelCodeExt in oldModelCodeExts:
+            oldModelCode = f"{oldModelCodeBase}_{oldModelCodeExt}"
+            rowCount = rowCounts.pop(f"uBody_{oldModelCode}", 0)
+            print(f"uBody_{oldModelCode} -> uBody_{newModelCode} : {rowCount} rows modified")
+            if rowCount == 0:
+                warnings.warn(f"uBody_{oldModelCode} entry not found!")
+            if bIncludeOBody:
+                rowCount = rowCounts.pop(f"oBody_{oldModelCode}", 0)
+                print(f"oBody_{oldModelCode} -> oBody_{newModelCode} : {rowCount} rows modified")
+                if rowCount == 0:
+                    print(f"oBody_{oldModelCode} entry not found. This might be expected. Please verify.")
+
+def add_model_code_replacement(modelMap, oldModel, newModel):
+    # Redirect earlier replacements that produce oldModel
+    for key, value in modelMap.items():
+        if value == oldModel:
+            modelMap[key] = newModel
+    # Rows with oldModel that an earlier entry already replaced are not replaced again
+    if oldModel not in modelMap:
+        modelMap[oldModel] = newModel
+
+
+# Writes the Asset Table of a mod with every entry of replacements applied
+#   xmlDoc optionally is an already parsed base Asset Table. It is not modified, so it can be shared by many mods.
+#   If None, the base file is parsed (or streamed).
+def build_mod(replacements, modFolder, xmlDoc=None):
+    outputAssetTablePath = get_output_asset_table_path(modFolder)
+    # A new mod folder doesn't have its patches/xml (or patches/xmlpatch) folder yet
+    outputAssetTablePath.parent.mkdir(parents=True, exist_ok=True)
+    if lowMemoryMode and xmlDoc is None:
+        stream_class_outfits(inputAssetTablePath, outputAssetTablePath, replacements)
+        return
+
+    if xmlDoc is None:
+        with stage('parse'):
+            xmlDoc = parse_xml_cached(inputAssetTablePath)
+    # Record the changes in an overlay instead of modifying the base tree, then merge them in while writing the new file
+    overlay = SheetOverlay(xmlDoc)
+    replace_class_outfits(overlay.data, replacements, overlay)
+    with stage('serialize'):
+        if deltaPatches:
+            overlay.write_patch(outputAssetTablePath, inputAssetTablePath)
+        else:
+            overlay.write(outputAssetTablePath)
+
+# Builds each variant, as (replaceUniqueClassModels, modFolder), from a single parse of the base Asset Table
+def build_variants(variants):
+    xmlDoc = parse_xml_cached(inputAssetTablePath)
+    for includeUniqueClassModels, variantModFolder in variants:
+        print(f"=== {variantModFolder} (replaceUniqueClassModels={includeUniqueClassModels})")
+        build_mod(get_replacements_data(includeUniqueClassModels), variantModFolder, xmlDoc)
 
 
-# Write the modified XML to a new file
-xmlDoc.write(outputAssetTablePath, encoding="utf-8", xml_declaration=True)
\ No newline at end of file
+# Main Execution
+if __name__ == '__main__':
+    with profile_session(profileStages, profileDumpPath):
+        if variants:
+            build_variants(variants)
+        else:
+            build_mod(get_replacements_data(replaceUniqueClassModels), modFolder)
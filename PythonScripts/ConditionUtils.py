@@ -0,0 +1,124 @@
+from collections import defaultdict
+
+# Asset Table "Conditions" expressions
+# A Conditions string is a list of clauses separated by ';'. Every clause must hold for the row to apply.
+# A clause is one or more alternatives separated by '|', and holds if any of them does. An alternative is a token that the
+# unit must have (ex. "女装", "MPID_Lueur", "JID_神竜ノ子", "AID_SkimpyThiefT1"), or a token it must not have if prefixed with '!'.
+# Examples:
+#   "AID_x;女装;!チキ;!竜化;"                      The unit has AID_x and 女装, and neither チキ nor 竜化
+#   "AID_x;MPID_Lueur;JID_神竜ノ子|JID_神竜ノ王;"  The unit has AID_x and MPID_Lueur, and either of the two classes
+# Whitespace around tokens is ignored (the base files have some, ex. "AID_異形兵 | AID_レア異形兵").
+
+# Parses a Conditions string into a list of clauses, each a list of (token, negated) alternatives
+def parse_conditions(conditions):
+    clauses = []
+    for clause in conditions.split(';'):
+        alternatives = []
+        for alternative in clause.split('|'):
+            alternative = alternative.strip()
+            negated = alternative.startswith('!')
+            token = alternative[1:].strip() if negated else alternative
+            if token:
+                alternatives.append((token, negated))
+        if alternatives:
+            clauses.append(alternatives)
+    return clauses
+
+# A row's conditions compiled into bit masks over the tokens interned by a ConditionIndex
+#   requiredMask: tokens of single-alternative clauses that the unit must have
+#   forbiddenMask: tokens of single-alternative clauses that the unit must not have
+#   anyOfClauses: (mask of required alternatives, mask of negated alternatives) for each clause with several alternatives
+class CompiledConditions:
+    __slots__ = ('requiredMask', 'forbiddenMask', 'anyOfClauses')
+
+    def __init__(self, requiredMask, forbiddenMask, anyOfClauses):
+        self.requiredMask = requiredMask
+        self.forbiddenMask = forbiddenMask
+        self.anyOfClauses = anyOfClauses
+
+    def matches(self, stateMask):
+        if stateMask & self.requiredMask != self.requiredMask or stateMask & self.forbiddenMask:
+            return False
+        for requiredAlternatives, negatedAlternatives in self.anyOfClauses:
+            if not (stateMask & requiredAlternatives or negatedAlternatives & ~stateMask):
+                return False
+        return True
+
+# Resolves which rows apply to a unit state, given as a set of tokens (ex. {"MPID_Lueur", "JID_神竜ノ子", "女装", "AID_x"})
+# Every row's conditions are parsed once into bit masks. Rows are indexed by one of their required tokens (the one shared by
+# the fewest rows), so a query only checks the rows anchored on one of its own tokens, plus the rows with no required token.
+class ConditionIndex:
+    def __init__(self, rows, attributeName='Conditions'):
+        self.rows = list(rows)
+        # Token -> bit
+        self.tokenBits = {}
+        self.compiledConditions = [self.compile(parse_conditions(row.get(attributeName) or '')) for row in self.rows]
+
+        # Anchor each row on its least common required token
+        requiredCounts = defaultdict(int)
+        for compiled in self.compiledConditions:
+            for bit in iterate_bits(compiled.requiredMask):
+                requiredCounts[bit] += 1
+        # Bit -> indices of the rows anchored on it, and the indices of the rows that have no required token
+        self.rowsByAnchor = defaultdict(list)
+        self.unanchoredRows = []
+        for i, compiled in enumerate(self.compiledConditions):
+            if compiled.requiredMask:
+                anchor = min(iterate_bits(compiled.requiredMask), key=requiredCounts.__getitem__)
+                self.rowsByAnchor[anchor].append(i)
+            else:
+                self.unanchoredRows.append(i)
+
+    def get_token_bit(self, token):
+        bit = self.tokenBits.get(token)
+        if bit is None:
+            bit = self.tokenBits[token] = 1 << len(self.tokenBits)
+        return bit
+
+    def compile(self, clauses):
+        requiredMask = 0
+        forbiddenMask = 0
+        anyOfClauses = []
+        for alternatives in clauses:
+            if len(alternatives) == 1:
+                token, negated = alternatives[0]
+                if negated:
+                    forbiddenMask |= self.get_token_bit(token)
+                else:
+                    requiredMask |= self.get_token_bit(token)
+            else:
+                requiredAlternatives = 0
+                negatedAlternatives = 0
+                for token, negated in alternatives:
+                    if negated:
+                        negatedAlternatives |= self.get_token_bit(token)
+                    else:
+                        requiredAlternatives |= self.get_token_bit(token)
+                anyOfClauses.append((requiredAlternatives, negatedAlternatives))
+        return CompiledConditions(requiredMask, forbiddenMask, tuple(anyOfClauses))
+
+    # Bit mask of a unit state. Tokens that no row mentions don't affect any row, so they are ignored.
+    def get_state_mask(self, state):
+        stateMask = 0
+        for token in state:
+            stateMask |= self.tokenBits.get(token, 0)
+        return stateMask
+
+    # Returns the indices (in table order) of the rows whose conditions hold for state
+    def match_indices(self, state):
+        stateMask = self.get_state_mask(state)
+        candidates = list(self.unanchoredRows)
+        for bit in iterate_bits(stateMask):
+            candidates += self.rowsByAnchor.get(bit, ())
+        candidates.sort()
+        return [i for i in candidates if self.compiledConditions[i].matches(stateMask)]
+
+    # Returns the rows (in table order) whose conditions hold for state
+    def match(self, state):
+        return [self.rows[i] for i in self.match_indices(state)]
+
+def iterate_bits(mask):
+    while mask:
+        bit = mask & -mask
+        yield bit
+        mask ^= bit
@@ -1,15 +1,38 @@
-import os
 import sys
-from PIL import Image
-
-for src in sys.argv[1:]:
-    outname = os.path.splitext(src)[0]
-    try:
-        img = Image.open(src).convert("RGBA")
-        data = img.getdata()
-        normalmap = [(d[3], d[1], d[0], 255) for d in data]
-        img.putdata(normalmap)
-        img.convert('RGB')
-        img.save(outname + ".png", format="PNG")
-    except IOError:
-        pass
\ No newline at end of file
+from TextureUtils import parse_remap_specs, remap_texture, defaultTilePixels, TextureCache, get_texture_cache_path, collect_sources, run_batch
+
+# Converts exported normal maps into the format used by the game
+# The channels are swizzled as (A, G, R, 255), i.e. A -> R, G -> G, R -> B, and alpha is set to fully opaque
+#
+# Usage: python EngageNormal.py <files, directories, or glob patterns>...
+# Directories are expanded to the normal maps inside them (PNGs matching normalMapPattern). Other textures of the folder
+# (albedo, multi, etc.) are left alone, since outputs replace their source. Files are processed in parallel, one worker per core.
+
+# Swizzle the whole image in one array operation. The output replaces the source (same name, as a PNG).
+normalMapRemaps = parse_remap_specs([
+    '.png = A,G,R,1',
+])
+
+# Files of a directory argument that are converted. Files and glob patterns given explicitly are always converted.
+normalMapPattern = "*[Nn]ormal*.png"
+
+# If True, textures are decoded, remapped and encoded in strips of rows instead of as a whole image (see remap_texture_tiled()).
+# Peak memory is then bounded by the strip size, which keeps very large (ex. 8K) textures from running out of memory.
+lowMemoryMode = False
+
+# Name of the output cache, kept in the folder containing the sources. Sources whose outputs were already generated from the
+# same content are skipped. If None, every source is processed.
+textureCacheName = ".texturecache.json"
+
+# If True, outputs that were deleted or regenerated since they were recorded are removed from the output cache
+pruneTextureCache = False
+
+def convert_normal_map(src):
+    remap_texture(src, normalMapRemaps, defaultTilePixels if lowMemoryMode else None)
+
+if __name__ == '__main__':
+    sources = collect_sources(sys.argv[1:], normalMapPattern)
+    cachePath = get_texture_cache_path(sources, textureCacheName) if textureCacheName else None
+    cache = TextureCache(cachePath, normalMapRemaps, pruneTextureCache) if cachePath else None
+    failures = run_batch(convert_normal_map, sources, cache=cache)
+    sys.exit(1 if failures else 0)
@@ -0,0 +1,111 @@
+import sys
+import xml.etree.ElementTree as ET
+from collections import Counter
+from ConditionUtils import parse_conditions
+from XmlUtils import read_patched_xml
+
+# Cross-file consistency checks for the outputs generated by SetupNewModOutfit.py
+# Item.xml, Shop.xml, AssetTable.xml and accessories.txt must agree on the AID_*, MAID_* and MAID_H_* ids of every outfit,
+# and the Asset Table rows of the outfits must use the uBody_/oBody_ models of their bundle codes. Otherwise, the problem only
+# shows up in-game (missing outfit, missing name, wrong model, etc.).
+# Each file is read once into hash sets/counters, so the checks stay linear in the size of the outputs.
+#
+# Usage: python ModValidator.py [modFolder]
+# Validates the outputs of setupData from SetupNewModOutfit.py, in modFolder (by default, the modFolder set there)
+
+# Returns the list of problems found, as messages. An empty list means the outputs are consistent.
+#   paths is the dict returned by SetupNewModOutfit.get_mod_output_paths()
+#   setupData is the list of OutfitData the outputs were generated from
+#   baseXmlPaths maps 'Item', 'Shop' and 'AssetTable' to their base files if the XML outputs are delta patches. They are then
+#   checked as applied to their base files.
+def validate_mod_outputs(paths, setupData, baseXmlPaths=None):
+    problems = []
+
+    def parse_output(name):
+        return read_patched_xml(baseXmlPaths[name], [paths[name]]) if baseXmlPaths is not None else ET.parse(paths[name])
+
+    outfitAids = {f"AID_{outfit.id}": outfit for outfit in setupData}
+    bundleCodes = {outfit.bundle_code for outfit in setupData}
+
+    # Item.xml: every accessory once, with the message ids of its outfit
+    itemAids = Counter()
+    messageIds = set()
+    for row in parse_output('Item').getroot().find('Sheet[@Name="アクセサリ"]/Data'):
+        aid = row.get('Aid')
+        itemAids[aid] += 1
+        outfit = outfitAids.get(aid)
+        if outfit is not None:
+            for attributeName, expected in (('Name', f"MAID_{outfit.id}"), ('Help', f"MAID_H_{outfit.id}")):
+                if row.get(attributeName) != expected:
+                    problems.append(f"Item.xml: {aid} has {attributeName}=\"{row.get(attributeName)}\" instead of \"{expected}\"")
+                messageIds.add(row.get(attributeName))
+    problems += [f"Item.xml: {aid} is listed {count} times" for aid, count in itemAids.items() if count > 1]
+    problems += [f"Item.xml: {aid} is missing" for aid in outfitAids if aid not in itemAids]
+
+    # Shop.xml: every listed accessory exists, and every outfit is sold once
+    shopAids = Counter(row.get('Aid') for row in parse_output('Shop').getroot().find('Sheet[@Name="アクセサリー屋"]/Data') if row.get('Aid'))
+    problems += [f"Shop.xml: {aid} is not an accessory of Item.xml" for aid in shopAids if aid not in itemAids]
+    problems += [f"Shop.xml: {aid} is listed {count} times" for aid, count in shopAids.items() if count > 1]
+    problems += [f"Shop.xml: {aid} is missing" for aid in outfitAids if aid not in shopAids]
+
+    # accessories.txt: every message once, and every message of an outfit is there
+    with open(paths['Accessories'], 'r', encoding='utf-8') as f:
+        messageLabels = Counter(line[1:-1] for line in f.read().splitlines() if line.startswith('[') and line.endswith(']'))
+    problems += [f"accessories.txt: [{label}] is listed {count} times" for label, count in messageLabels.items() if count > 1]
+    problems += [f"accessories.txt: [{messageId}] is missing" for messageId in sorted(messageIds) if messageId not in messageLabels]
+    problems += [f"accessories.txt: [{label}] is not used by any accessory of Item.xml" for label in messageLabels if label not in messageIds]
+
+    # AssetTable.xml: the rows of the mod only reference existing accessories, and the rows of each outfit use the models of
+    # a bundle code. The rows of the mod are the rows of an outfit and the rows using the model of a bundle code. The other rows
+    # come from the base file, which also references AID_* ids that are not accessories (ex. AID_Person_*).
+    bundleModels = {f"{prefix}{bundleCode}" for bundleCode in bundleCodes for prefix in ('uBody_', 'oBody_')}
+    # AID -> models used by its rows
+    modelsByAid = {}
+    missingAids = set()
+    for row in parse_output('AssetTable').getroot().find('Sheet/Data'):
+        rowAids = {token for clause in parse_conditions(row.get('Conditions') or '') for token, negated in clause
+                   if not negated and token.startswith('AID_')}
+        aids = {aid for aid in rowAids if aid in outfitAids}
+        if aids or row.get('DressModel') in bundleModels or row.get('BodyModel') in bundleModels:
+            missingAids.update(aid for aid in rowAids if aid not in itemAids)
+        if not aids:
+            continue
+        for aid in aids:
+            modelsByAid.setdefault(aid, set())
+        for attributeName, prefix in (('DressModel', 'uBody_'), ('BodyModel', 'oBody_')):
+            model = row.get(attributeName)
+            if not model:
+                continue
+            for aid in aids:
+                modelsByAid[aid].add(model)
+            if not model.startswith(prefix) or model[len(prefix):] not in bundleCodes:
+                problems.append(f"AssetTable.xml: row for {', '.join(sorted(aids))} has {attributeName}=\"{model}\", which is not the model of any bundle code")
+    problems += [f"AssetTable.xml: {aid} is not an accessory of Item.xml" for aid in sorted(missingAids)]
+    for aid, outfit in outfitAids.items():
+        if aid not in modelsByAid:
+            problems.append(f"AssetTable.xml: no row for {aid}")
+            continue
+        models = modelsByAid[aid]
+        if f"uBody_{outfit.bundle_code}" not in models:
+            problems.append(f"AssetTable.xml: no uBody_{outfit.bundle_code} row for {aid}")
+        if outfit.include_obody and f"oBody_{outfit.bundle_code}" not in models:
+            problems.append(f"AssetTable.xml: no oBody_{outfit.bundle_code} row for {aid}")
+    return problems
+
+# Validates the outputs and prints the problems found. Returns the list of problems.
+def report_mod_problems(paths, setupData, baseXmlPaths=None):
+    problems = validate_mod_outputs(paths, setupData, baseXmlPaths)
+    if problems:
+        print(f"Validation found {len(problems)} problem(s):")
+        for problem in problems:
+            print(f"  {problem}")
+    else:
+        print(f"Validation: {len(setupData)} outfits consistent across Item.xml, Shop.xml, AssetTable.xml and accessories.txt")
+    return problems
+
+if __name__ == '__main__':
+    import SetupNewModOutfit
+    modFolder = sys.argv[1] if len(sys.argv) > 1 else SetupNewModOutfit.modFolder
+    problems = report_mod_problems(SetupNewModOutfit.get_mod_output_paths(modFolder), SetupNewModOutfit.setupData,
+                                   SetupNewModOutfit.baseXmlPaths if SetupNewModOutfit.deltaPatches else None)
+    sys.exit(1 if problems else 0)
@@ -0,0 +1,56 @@
+import argparse
+import csv
+import sys
+import time
+from ConditionUtils import ConditionIndex
+from XmlUtils import parse_xml_cached
+
+# Previews which Asset Table rows apply to every character x class combination, to check the coverage of outfits
+# For each combination, the unit state is {character, class} plus the extra tokens, and the DressModel (uBody) and
+# BodyModel (oBody) values of every matching row are listed in table order.
+#
+# Usage: python PreviewOutfitCoverage.py [--asset-table path] [--characters MPID_Lueur ...] [--classes JID_神竜ノ子 ...]
+#                                        [--tokens 女装 AID_SkimpyThiefT1 ...] [--csv path]
+# By default, every MPID_ token and every JID_ token found in the table is used.
+# Example (coverage of a generated mod's outfit for female units):
+#   python PreviewOutfitCoverage.py --asset-table .../patches/xml/AssetTable.xml --tokens 女装 AID_SkimpyThiefT1
+
+def get_tokens_with_prefix(index, prefix):
+    return sorted(token for token in index.tokenBits if token.startswith(prefix))
+
+def get_model_values(rows, attributeName):
+    return [row.get(attributeName) for row in rows if row.get(attributeName)]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Previews which Asset Table rows apply to every character x class combination")
+    parser.add_argument("--asset-table", default="./BaseXml/base_AssetTable_NoDebug.xml", help="Path to the Asset Table XML")
+    parser.add_argument("--characters", nargs="+", help="Character tokens (default: every MPID_ token in the table)")
+    parser.add_argument("--classes", nargs="+", help="Class tokens (default: every JID_ token in the table)")
+    parser.add_argument("--tokens", nargs="+", default=[], help="Tokens added to every unit state (ex. 女装, AID_...)")
+    parser.add_argument("--csv", help="Write the results to this CSV file instead of printing them")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    index = ConditionIndex(parse_xml_cached(args.asset_table).getroot().find('Sheet/Data'))
+    print(f"Indexed {len(index.rows)} rows ({len(index.tokenBits)} distinct tokens) in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+
+    characters = args.characters or get_tokens_with_prefix(index, 'MPID_')
+    classes = args.classes or get_tokens_with_prefix(index, 'JID_')
+    results = []
+    start = time.perf_counter()
+    for character in characters:
+        for className in classes:
+            rows = index.match({character, className, *args.tokens})
+            results.append((character, className, len(rows), get_model_values(rows, 'DressModel'), get_model_values(rows, 'BodyModel')))
+    elapsed = time.perf_counter() - start
+
+    if args.csv:
+        with open(args.csv, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['Character', 'Class', 'Matching rows', 'DressModel', 'BodyModel'])
+            for character, className, rowCount, dressModels, bodyModels in results:
+                writer.writerow([character, className, rowCount, ' '.join(dressModels), ' '.join(bodyModels)])
+    else:
+        for character, className, rowCount, dressModels, bodyModels in results:
+            print(f"{character} {className} : {rowCount} rows, DressModel [{', '.join(dressModels)}], BodyModel [{', '.join(bodyModels)}]")
+    print(f"Resolved {len(results)} combinations in {elapsed:.2f}s ({len(results) / elapsed if elapsed else 0:.0f} queries/s)", file=sys.stderr)
@@ -0,0 +1,121 @@
+import cProfile
+import os
+import pstats
+import time
+import tracemalloc
+
+# Stage timing and profiling for the mod generation scripts
+# Code wraps each step of its work in a stage:
+#     with stage('parse') as s:
+#         xmlDoc = parse_xml_cached(path)
+#         s.rows = len(xmlDoc.getroot().find('Sheet/Data'))
+# When profiling is enabled (see profile_session()), the wall time, peak memory and rows touched by every stage are recorded
+# and printed as a report at the end. Stages can be nested, and the report is indented to match.
+# When it is disabled, a stage does nothing, so the instrumentation can stay in the code.
+#
+# Profiling is enabled by the profile_session() arguments, or with these environment variables:
+#   ENGAGE_PROFILE=1              Print the stage report
+#   ENGAGE_PROFILE_DUMP=<path>    Also run the whole session under cProfile and save the stats to <path> (view with pstats or snakeviz)
+# Note: peak memory is measured with tracemalloc, which slows Python code down noticeably. Compare wall times between stages
+# of the same run, not against runs without profiling.
+
+profilingEnabled = False
+
+# Every stage recorded in the current session, in the order they started
+stageRecords = []
+stageStack = []
+
+class StageRecord:
+    def __init__(self, name, depth, rows=None):
+        self.name = name
+        self.depth = depth
+        # Rows read, added, modified or written by the stage. Set by the code in the stage when it is known.
+        self.rows = rows
+        self.seconds = 0.0
+        self.peakBytes = 0
+
+class Stage:
+    def __init__(self, name, rows=None):
+        self.name = name
+        self.rows = rows
+
+    def __enter__(self):
+        if not profilingEnabled:
+            # Nothing is recorded, but the code in the stage can still set rows
+            return StageRecord(self.name, 0, self.rows)
+        if stageStack:
+            # The peak is reset below, so keep the parent's peak so far
+            parent = stageStack[-1]
+            parent.absolutePeak = max(parent.absolutePeak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+        self.record = StageRecord(self.name, len(stageStack), self.rows)
+        self.baseline = self.absolutePeak = tracemalloc.get_traced_memory()[0]
+        stageRecords.append(self.record)
+        stageStack.append(self)
+        self.start = time.perf_counter()
+        return self.record
+
+    def __exit__(self, excType, excValue, traceback):
+        if not profilingEnabled:
+            return False
+        self.record.seconds = time.perf_counter() - self.start
+        self.absolutePeak = max(self.absolutePeak, tracemalloc.get_traced_memory()[1])
+        self.record.peakBytes = self.absolutePeak - self.baseline
+        stageStack.pop()
+        if stageStack:
+            stageStack[-1].absolutePeak = max(stageStack[-1].absolutePeak, self.absolutePeak)
+        return False
+
+def stage(name, rows=None):
+    return Stage(name, rows)
+
+def print_stage_report():
+    print(f"{'Stage':<50} {'Time (s)':>9} {'Peak (MB)':>10} {'Rows':>8}")
+    for record in stageRecords:
+        name = '  ' * record.depth + record.name
+        rows = record.rows if record.rows is not None else ''
+        print(f"{name:<50} {record.seconds:>9.3f} {record.peakBytes / 1e6:>10.1f} {rows:>8}")
+
+class ProfileSession:
+    def __init__(self, enabled=False, dumpPath=None):
+        self.dumpPath = dumpPath or os.environ.get('ENGAGE_PROFILE_DUMP') or None
+        self.enabled = enabled or os.environ.get('ENGAGE_PROFILE', '') not in ('', '0') or self.dumpPath is not None
+        self.profiler = None
+
+    def __enter__(self):
+        global profilingEnabled
+        if not self.enabled:
+            return self
+        profilingEnabled = True
+        stageRecords.clear()
+        stageStack.clear()
+        self.startedTracing = not tracemalloc.is_tracing()
+        if self.startedTracing:
+            tracemalloc.start()
+        if self.dumpPath is not None:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        global profilingEnabled
+        if not self.enabled:
+            return False
+        if self.profiler is not None:
+            self.profiler.disable()
+        if self.startedTracing:
+            tracemalloc.stop()
+        profilingEnabled = False
+
+        print_stage_report()
+        if self.profiler is not None:
+            self.profiler.dump_stats(self.dumpPath)
+            print(f"cProfile stats saved to {self.dumpPath}. Top functions by cumulative time:")
+            pstats.Stats(self.profiler).sort_stats('cumulative').print_stats(15)
+        return False
+
+# Context manager that enables profiling for the code it wraps, then prints the stage report (and saves the cProfile stats)
+#   enabled and dumpPath default to the ENGAGE_PROFILE and ENGAGE_PROFILE_DUMP environment variables.
+#   If profiling is not enabled, it does nothing.
+def profile_session(enabled=False, dumpPath=None):
+    return ProfileSession(enabled, dumpPath)
@@ -0,0 +1,34 @@
+import argparse
+import functools
+import sys
+from TextureUtils import parse_remap_specs, remap_texture, TextureCache, get_texture_cache_path, collect_sources, exclude_remap_outputs, run_batch
+
+# Remaps the channels of textures into one or more outputs, following channel remap specs (see ChannelRemap in TextureUtils.py)
+# Each source is decoded once, and every output is built from that buffer.
+#
+# Usage: python RemapChannels.py --spec "<output> = <channels>" [--spec ...] <files, directories, or glob patterns>...
+# Examples:
+#   python RemapChannels.py --spec "_R = R" --spec "_M = G" --spec "_AO = B" --spec "_Mask = A" Textures/    (same as SplitMulti.py)
+#   python RemapChannels.py --spec ".png = A,G,R,1" Textures/                                                  (same as EngageNormal.py)
+# Add --tile-pixels 262144 to process very large textures in strips of rows, with memory bounded by the strip size.
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Remaps texture channels into one or more outputs")
+    parser.add_argument("--spec", action="append", required=True, help='Channel remap spec, such as "_R = R" or ".png = A,G,R,1". Can be repeated.')
+    parser.add_argument("--tile-pixels", type=int, default=None, help="Process each texture in strips of about this many pixels to bound memory use (ex. 262144 for 8K textures)")
+    parser.add_argument("--cache", default=None, help="Path of the output cache (default: .texturecache.json in the folder containing the sources). Sources whose outputs were already generated from the same content are skipped.")
+    parser.add_argument("--no-cache", action="store_true", help="Process every source, without reading or updating the output cache")
+    parser.add_argument("--prune-cache", action="store_true", help="Remove outputs that were deleted or regenerated since they were recorded from the output cache")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: one per core)")
+    parser.add_argument("sources", nargs="+", help="Files, directories or glob patterns to process")
+    args = parser.parse_args()
+
+    try:
+        remaps = parse_remap_specs(args.spec)
+    except ValueError as e:
+        parser.error(str(e))
+    sources = exclude_remap_outputs(collect_sources(args.sources), remaps)
+    cachePath = args.cache or get_texture_cache_path(sources)
+    cache = None if args.no_cache or not cachePath else TextureCache(cachePath, remaps, args.prune_cache)
+    failures = run_batch(functools.partial(remap_texture, remaps=remaps, tilePixels=args.tile_pixels), sources, args.workers, cache)
+    sys.exit(1 if failures else 0)
@@ -1,15 +1,26 @@
+import copy
+import functools
 import xml.etree.ElementTree as ET
-import xml.dom.minidom
-import re
 from pathlib import Path
+from XmlUtils import SheetPatch, SheetSchema, hash_file, insert_rows, parse_xml_cached, read_sheet_schema, rewrite_sheet_streaming, write_xml_patch, write_xml_pretty
+from BuildUtils import BuildState, build_outputs, fingerprint, get_build_state_path
+from ProfileUtils import profile_session, stage
+from ModValidator import report_mod_problems
 
 class OutfitData:
-    def __init__(self, bundle_code, id=None, name=None, description=None, include_obody=True):
+    def __init__(self, bundle_code, id=None, name=None, description=None, include_obody=True, shop_chapter=5):
         self.bundle_code = bundle_code
         self.id = id if id is not None else bundle_code
         self.name = name if name is not None else bundle_code
         self.description = description if description is not None else ''
         self.include_obody = include_obody
+        # Chapter from which the outfit is sold in the Accessories Shop. The shop must have a section for it (5, 7, 10, 12, 16 and 20
+        # in the base Shop.xml). By default, chapter 5, when the shop opens.
+        # It can also be a string (ex. "7" in a BuildMods.py manifest). Going through str() rejects fractional chapters like 7.5.
+        try:
+            self.shop_chapter = int(str(shop_chapter))
+        except ValueError:
+            raise ValueError(f"shop_chapter of outfit {self.id} must be a chapter number (ex. 7), not {shop_chapter!r}!") from None
 
 # Inputs
 setupData = [
@@ -40,6 +51,36 @@ setupData = [
 # Note: If a mod folder is specified, this script will place files in accordance with their location for Cobalt mods.
 modFolder = "C:/Users/Burney/AppData/Roaming/Ryujinx/sdcard/engage/mods/SkimpyClassOutfitsT1"
 
+# If True, AssetTable.xml is generated by streaming the base file instead of loading it as a whole tree.
+# Peak memory then stays about the same no matter how big the base file is, and the base file's formatting is kept as is.
+lowMemoryMode = False
+
+# If True, outputs whose inputs (base XML files and the parts of setupData they use) did not change since the last run are skipped.
+# Outputs that are rebuilt are written atomically, and only if their content actually changed.
+# What was built is recorded in a build state file in buildStateFolder (not in the mod folder, so it is never shipped with the mod).
+incrementalBuild = False
+
+# If True, Item.xml, Shop.xml and AssetTable.xml are replaced by delta patches that only contain the rows added to the base files (see
+# write_xml_patch() in XmlUtils.py), instead of full copies of the base files. Their size and write time then depend on the number of
+# outfits only, and patches from different mods can be applied to the same base file together.
+# Cobalt loads every file of patches/xml as a full XML file, so the patches are written to patches/xmlpatch/*.xmlpatch instead, and
+# must be applied before the mod can be played, ex.:
+#   python ApplyXmlPatch.py ./BaseXml/base_Item.xml <modFolder>/patches/xml/Item.xml <modFolder>/patches/xmlpatch/Item.xmlpatch
+deltaPatches = False
+
+# If True, the outputs are checked against each other after every build (AID/MAID ids, uBody/oBody models, see ModValidator.py)
+validateOutputs = True
+
+# If True, the outputs (Item, Shop, AssetTable, accessories) are generated at the same time, each on its own worker process.
+# They don't depend on each other, so the total time is about that of the slowest output.
+parallelBuild = False
+
+# If True, the wall time, peak memory and rows of each stage (parse, search, serialize, etc.) are printed at the end.
+# If profileDumpPath is set, the run is also profiled with cProfile and the stats are saved there.
+# These can also be enabled with the ENGAGE_PROFILE=1 and ENGAGE_PROFILE_DUMP=<path> environment variables (see ProfileUtils.py).
+profileStages = False
+profileDumpPath = None
+
 # Constants
 baseXmlFolder = './BaseXml'  # Path to the folder that contains the base (original, unmodified) XML files
 
@@ -47,13 +88,36 @@ baseXmlFolder = './BaseXml'  # Path to the folder that contains the base (origin
 baseAssetTableXmlPath = Path(baseXmlFolder) / 'base_AssetTable.xml'
 baseItemXmlPath = Path(baseXmlFolder) / 'base_Item.xml'
 baseShopXmlPath = Path(baseXmlFolder) / 'base_Shop.xml'
+baseXmlPaths = {'AssetTable': baseAssetTableXmlPath, 'Item': baseItemXmlPath, 'Shop': baseShopXmlPath}
+
+# Folder of the build state files of incremental builds, one per mod folder
+buildStateFolder = Path(__file__).parent / '.buildstate'
+
 
-modAssetTableXmlPath = Path(modFolder) / 'patches/xml' / 'AssetTable.xml' if modFolder != None else Path('AssetTable.xml')
-modItemXmlPath = Path(modFolder) / 'patches/xml' / 'Item.xml' if modFolder != None else Path('Item.xml')
-modShopXmlPath = Path(modFolder) / 'patches/xml' / 'Shop.xml' if modFolder != None else Path('Shop.xml')
-modAccessoriesTextPath = Path(modFolder) / 'patches/msbt/message/us/usen' / 'accessories.txt' if modFolder != None else Path('accessories.txt')
+# Path of a generated XML file (ex. "Item"), or of its delta patch if deltaPatches is True
+def get_xml_output_path(modFolder, name):
+    if deltaPatches:
+        return Path(modFolder) / 'patches/xmlpatch' / f"{name}.xmlpatch" if modFolder != None else Path(f"{name}.xmlpatch")
+    return Path(modFolder) / 'patches/xml' / f"{name}.xml" if modFolder != None else Path(f"{name}.xml")
 
-def update_item_xml():
+# Paths of the files generated for a mod. If modFolder is None, the files go in the current working directory.
+def get_mod_output_paths(modFolder):
+    return {
+        'AssetTable': get_xml_output_path(modFolder, 'AssetTable'),
+        'Item': get_xml_output_path(modFolder, 'Item'),
+        'Shop': get_xml_output_path(modFolder, 'Shop'),
+        'Accessories': Path(modFolder) / 'patches/msbt/message/us/usen' / 'accessories.txt' if modFolder != None else Path('accessories.txt'),
+        'BuildState': get_build_state_path(buildStateFolder, modFolder if modFolder != None else '.'),
+    }
+
+# Bump this when a change to this script changes the generated outputs for the same inputs, so that incremental builds rebuild everything
+outputFormatVersion = 1
+
+# Each update_* function below takes an optional xmlDoc, which is a private copy of the base tree to modify.
+# If it is None, the base file is parsed. The tree is modified by the matching add_*_rows function, then written to outputPath.
+# If deltaPatches is True, only the new rows are written to outputPath, as a delta patch of the base file.
+
+def update_item_xml(outputPath, setupData, xmlDoc=None):
     # Item.xml structure is like this:
     # <Book>
     #     <Sheet Name="SheetName">
@@ -66,18 +130,34 @@ def update_item_xml():
     #     </Sheet>
     # </Book>
     # We are looking for a Sheet named "アクセサリ", which lists "accessories". We'll add our new outfit as an accessory that can be bought.
-    xmlDoc = ET.parse(baseItemXmlPath)
+    if deltaPatches:
+        # The new rows go at the end of the sheet, so the base file doesn't need to be parsed
+        patch = SheetPatch("アクセサリ")
+        patch.append([create_item_xml_element(outfit) for outfit in setupData])
+        with stage('write patch', rows=len(setupData)):
+            write_xml_patch(outputPath, baseItemXmlPath, [patch])
+        return
+
+    if xmlDoc is None:
+        with stage('parse'):
+            xmlDoc = parse_xml_cached(baseItemXmlPath)
+    with stage('add rows', rows=len(setupData)):
+        add_item_rows(xmlDoc, setupData)
+
+    # Save the modified XML to a new file
+    with stage('serialize'):
+        write_xml_pretty(xmlDoc, outputPath)
+
+def add_item_rows(xmlDoc, setupData):
     root = xmlDoc.getroot()
-    data = root.find('Sheet[@Name="アクセサリ"]/Data')
+    with stage('find sheet'):
+        data = root.find('Sheet[@Name="アクセサリ"]/Data')
 
     for outfit in setupData:
         newNode = create_item_xml_element(outfit)
         data.append(newNode)
 
-    # Save the modified XML to a new file
-    write_xml_pretty(xmlDoc, modItemXmlPath)
-
-def update_shop_xml():
+def update_shop_xml(outputPath, setupData, xmlDoc=None):
     # Shop.xml structure is like this:
     # <Book>
     #     <Sheet Name="SheetName">
@@ -90,39 +170,77 @@ def update_shop_xml():
     #     </Sheet>
     # </Book>
     # We are looking for a Sheet named "アクセサリー屋", which is the Accessories Shop. We'll add our new outfit as an accessory in this shop.
-    xmlDoc = ET.parse(baseShopXmlPath)
-    root = xmlDoc.getroot()
-    data = root.find('Sheet[@Name="アクセサリー屋"]/Data')
-
-    # We want to add our new outfits as early as possible, which means after Chapter 5 when the shop opens.
-    # This <Data> element lists the items available in the shop with special elements denoting the chapter they become available.
-    # Example:
-    # <Data>
-    #     <Param Condition="M005" Aid="" />
-    #     // <Param ... /> elements for outfits available from Chapter 5
-    #     <Param Condition="M007" Aid="" />
-    #     // <Param ... /> elements for outfits available from Chapter 7
-    #     etc...
-    # </Data>
-    # We want to insert the new outfits right before <Param Condition="M007" Aid="" />
-    # But we'll need to find the index of that first. (For original Shop.xml, this index should be 8)
-    startIndex = None
-    for i, child in enumerate(data):
-        if child.get('Condition') == 'M007':
-            startIndex = i
-            break
-    if startIndex is None:
-        raise ValueError('Could not find the <Param Condition="M007" Aid="" /> element for inserting new outfits in Shop.xml!')
-    
-    # Insert the new outfits before the found index. To keep the original order, we need to insert them in reverse order.
-    for outfit in reversed(setupData):
-        newNode = create_shop_xml_element(outfit)
-        data.insert(startIndex, newNode)
+    if xmlDoc is None:
+        with stage('parse'):
+            xmlDoc = parse_xml_cached(baseShopXmlPath)
+    if deltaPatches:
+        patch = SheetPatch("アクセサリー屋")
+        with stage('plan rows', rows=len(setupData)):
+            for beforeIndex, rows in plan_shop_rows(xmlDoc, setupData).items():
+                patch.insert(beforeIndex, rows)
+        with stage('write patch', rows=len(setupData)):
+            write_xml_patch(outputPath, baseShopXmlPath, [patch])
+        return
+    with stage('add rows', rows=len(setupData)):
+        add_shop_rows(xmlDoc, setupData)
 
     # Save the modified XML to a new file
-    write_xml_pretty(xmlDoc, modShopXmlPath)
+    with stage('serialize'):
+        write_xml_pretty(xmlDoc, outputPath)
 
-def update_asset_table_xml():
+def add_shop_rows(xmlDoc, setupData):
+    insertions = plan_shop_rows(xmlDoc, setupData)
+    # Splice every new row into the sheet at once
+    with stage('insert'):
+        insert_rows(xmlDoc.getroot().find('Sheet[@Name="アクセサリー屋"]/Data'), insertions)
+
+# Works out where the new outfits go in the Accessories Shop. Returns {index of the row they go before: new rows}.
+def plan_shop_rows(xmlDoc, setupData):
+    root = xmlDoc.getroot()
+    with stage('find sheet'):
+        data = root.find('Sheet[@Name="アクセサリー屋"]/Data')
+    with stage('index chapters', rows=len(data)):
+        planner = ShopPlanner(data)
+
+    insertions = {}
+    for outfit in setupData:
+        insertions.setdefault(planner.get_insertion_index(outfit.shop_chapter), []).append(create_shop_xml_element(outfit))
+    return insertions
+
+# Positions of the chapter sections of the Accessories Shop, indexed in one pass over its <Data> element
+# This <Data> element lists the items available in the shop with special elements denoting the chapter they become available.
+# Example:
+# <Data>
+#     <Param Condition="M005" Aid="" />
+#     // <Param ... /> elements for outfits available from Chapter 5
+#     <Param Condition="M007" Aid="" />
+#     // <Param ... /> elements for outfits available from Chapter 7
+#     etc...
+# </Data>
+# An outfit sold from Chapter 7 goes at the end of the Chapter 7 section, right before <Param Condition="M010" Aid="" />.
+# (For original Shop.xml, the Chapter 5 outfits go at index 8, before <Param Condition="M007" Aid="" />)
+class ShopPlanner:
+    def __init__(self, data):
+        # Chapter marker condition (ex. "M007") -> index of the row that ends its section (the next marker, or the end of <Data>)
+        self.sectionEnds = {}
+        condition = None
+        for i, row in enumerate(data):
+            if row.get('Condition') and not row.get('Aid'):
+                if condition is not None:
+                    self.sectionEnds.setdefault(condition, i)
+                condition = row.get('Condition')
+        if condition is not None:
+            self.sectionEnds.setdefault(condition, len(data))
+
+    # Index of the row that the outfits sold from chapter go before
+    def get_insertion_index(self, chapter):
+        index = self.sectionEnds.get(f"M{chapter:03}")
+        if index is None:
+            raise ValueError(f'Could not find the <Param Condition="M{chapter:03}" Aid="" /> element for inserting new outfits in Shop.xml! '
+                             f'Chapters of the shop: {", ".join(condition.lstrip("M0") for condition in self.sectionEnds)}')
+        return index
+
+def update_asset_table_xml(outputPath, setupData, xmlDoc=None):
     # AssetTable.xml structure is like this:
     # <Book>
     #     <Sheet>
@@ -135,33 +253,66 @@ def update_asset_table_xml():
     #     </Sheet>
     # </Book>
     # There's just one <Sheet> element here. We'll add our new outfits to the end of the <Data> section.
-    xmlDoc = ET.parse(baseAssetTableXmlPath)
-    root = xmlDoc.getroot()
-    data = root.find('Sheet/Data')
+    # The new rows only store the attributes that differ from the column defaults of the <Header>, and are expanded as they are written.
+    if deltaPatches:
+        # Only the new rows are written, so only the <Header> of the base file is read
+        with stage('add rows') as addRowsStage:
+            patch = SheetPatch()
+            patch.append(create_asset_table_rows(setupData, read_sheet_schema(baseAssetTableXmlPath)))
+            addRowsStage.rows = len(patch.insertedRows[None])
+        with stage('write patch', rows=addRowsStage.rows):
+            write_xml_patch(outputPath, baseAssetTableXmlPath, [patch])
+        return
+
+    if lowMemoryMode and xmlDoc is None:
+        # Stream the base file straight into the output, appending the new rows as the end of <Data> goes by
+        with stage('add rows') as addRowsStage:
+            newRows = create_asset_table_rows(setupData, read_sheet_schema(baseAssetTableXmlPath))
+            addRowsStage.rows = len(newRows)
+        with stage('stream', rows=len(newRows)):
+            rewrite_sheet_streaming(baseAssetTableXmlPath, outputPath, newRows=newRows)
+        return
+
+    if xmlDoc is None:
+        with stage('parse'):
+            xmlDoc = parse_xml_cached(baseAssetTableXmlPath)
+    with stage('add rows') as addRowsStage:
+        appendedRows = add_asset_table_rows(xmlDoc, setupData)
+        addRowsStage.rows = sum(len(rows) for rows in appendedRows.values())
 
+    # Save the modified XML to a new file
+    with stage('serialize'):
+        write_xml_pretty(xmlDoc, outputPath, appendedRows)
+
+# Creates the new rows from the schema of the sheet. Returns them as {<Data> element: rows}, to pass to write_xml_pretty().
+# The tree itself is not modified.
+def add_asset_table_rows(xmlDoc, setupData):
+    sheet = xmlDoc.getroot().find('Sheet')
+    return {sheet.find('Data'): create_asset_table_rows(setupData, SheetSchema.from_header(sheet.find('Header')))}
+
+# Creates the Asset Table rows for every outfit, in the order they should be appended
+#   schema is the SheetSchema of the Asset Table, which gives the columns and their default values
+def create_asset_table_rows(setupData, schema):
+    rows = []
     for outfit in setupData:
         # uBody entry
-        uBodyNode = create_asset_table_ubody_element(outfit)
-        data.append(uBodyNode)
+        rows.append(create_asset_table_ubody_element(schema, outfit))
 
         if outfit.include_obody:
             # oBody (map model) entry
-            oBodyNode = create_asset_table_obody_element(outfit)
-            data.append(oBodyNode)
+            rows.append(create_asset_table_obody_element(schema, outfit))
             # Alear hair fix entry
-            alearHairFixNode = create_asset_table_alear_hair_fix_element(outfit)
-            data.append(alearHairFixNode)
-
-    # Save the modified XML to a new file
-    write_xml_pretty(xmlDoc, modAssetTableXmlPath)
+            rows.append(create_asset_table_alear_hair_fix_element(schema, outfit))
+    return rows
 
-def create_accessories_text_file():
-    textContentArray = [get_accessories_text_for_outfit(outfit) for outfit in setupData]
-    textContent = '\n'.join(textContentArray)
+def create_accessories_text_file(outputPath, setupData):
+    with stage('write', rows=len(setupData)):
+        textContentArray = [get_accessories_text_for_outfit(outfit) for outfit in setupData]
+        textContent = '\n'.join(textContentArray)
 
-    # Write the text content to a file
-    with open(modAccessoriesTextPath, 'w', encoding='utf-8') as f:
-        f.write(textContent)
+        # Write the text content to a file
+        with open(outputPath, 'w', encoding='utf-8') as f:
+            f.write(textContent)
 
 # XML Element Generation
 def create_item_xml_element(outfit):
@@ -195,127 +346,37 @@ def create_shop_xml_element(outfit):
         'Aid': f"AID_{outfit.id}",
     })
 
-def create_asset_table_ubody_element(outfit):
-    return create_asset_table_element({
+def create_asset_table_ubody_element(schema, outfit):
+    return create_asset_table_element(schema, {
         "Mode": "2",
         "Conditions": f"AID_{outfit.id};女装;!チキ;!竜化;",
         "DressModel": f"uBody_{outfit.bundle_code}",
         "Comment": f"{outfit.name}",
     })
 
-def create_asset_table_obody_element(outfit):
-    return create_asset_table_element({
+def create_asset_table_obody_element(schema, outfit):
+    return create_asset_table_element(schema, {
         "Mode": "1",
         "Conditions": f"AID_{outfit.id};女装;!チキ;!竜化;",
         "BodyModel": f"oBody_{outfit.bundle_code}",
         "Comment": f"{outfit.name} map model",
     })
 
-def create_asset_table_alear_hair_fix_element(outfit):
+def create_asset_table_alear_hair_fix_element(schema, outfit):
     # For some strange reason, Alear in Dragon Child / Divine Dragon class does NOT use her normal hair for the map model
     # I have no idea why. But we can fix it by adding a special entry for her.
     # Condition is: Using the outfit AND Alear AND female AND not Tiki/Dragon AND (Class is Dragon Child OR Class is Divine Dragon)
-    return create_asset_table_element({
+    return create_asset_table_element(schema, {
         "Mode": "1",
         "Conditions": f"AID_{outfit.id};MPID_Lueur;女装;!チキ;!竜化;JID_神竜ノ子|JID_神竜ノ王;",
         "HeadModel": "oHair_h051",
         "Comment": f"Alear hair fix for {outfit.name} map model",
     })
 
-def create_asset_table_element(overridesDict):
-    element = create_asset_table_empty_element()
-    for key, value in overridesDict.items():
-        if element.get(key) is not None:
-            element.set(key, value)
-    return element
-
-
-# Creates an Asset Table entry without any overrides. This creates an element with all attributes in the default state
-def create_asset_table_empty_element():
-    return ET.Element('Param', {
-        "Out": "",
-        "PresetName": "",
-        "Mode": "",
-        "Conditions": "",
-        "BodyModel": "",
-        "DressModel": "",
-        "MaskColor100R": "0",
-        "MaskColor100G": "0",
-        "MaskColor100B": "0",
-        "MaskColor075R": "0",
-        "MaskColor075G": "0",
-        "MaskColor075B": "0",
-        "MaskColor050R": "0",
-        "MaskColor050G": "0",
-        "MaskColor050B": "0",
-        "MaskColor025R": "0",
-        "MaskColor025G": "0",
-        "MaskColor025B": "0",
-        "HeadModel": "",
-        "HairModel": "",
-        "HairR": "0",
-        "HairG": "0",
-        "HairB": "0",
-        "GradR": "0",
-        "GradG": "0",
-        "GradB": "0",
-        "SkinR": "0",
-        "SkinG": "0",
-        "SkinB": "0",
-        "ToonR": "0",
-        "ToonG": "0",
-        "ToonB": "0",
-        "RideModel": "",
-        "RideDressModel": "",
-        "LeftHand": "",
-        "RightHand": "",
-        "Trail": "",
-        "Magic": "",
-        "Acc1.Locator": "",
-        "Acc1.Model": "",
-        "Acc2.Locator": "",
-        "Acc2.Model": "",
-        "Acc3.Locator": "",
-        "Acc3.Model": "",
-        "Acc4.Locator": "",
-        "Acc4.Model": "",
-        "Acc5.Locator": "",
-        "Acc5.Model": "",
-        "Acc6.Locator": "",
-        "Acc6.Model": "",
-        "Acc7.Locator": "",
-        "Acc7.Model": "",
-        "Acc8.Locator": "",
-        "Acc8.Model": "",
-        "BodyAnim": "",
-        "InfoAnim": "",
-        "TalkAnim": "",
-        "DemoAnim": "",
-        "HubAnim": "",
-        "ScaleAll": "0",
-        "ScaleHead": "0",
-        "ScaleNeck": "0",
-        "ScaleTorso": "0",
-        "ScaleShoulders": "0",
-        "ScaleArms": "0",
-        "ScaleHands": "0",
-        "ScaleLegs": "0",
-        "ScaleFeet": "0",
-        "VolumeArms": "0",
-        "VolumeLegs": "0",
-        "VolumeBust": "0",
-        "VolumeAbdomen": "0",
-        "VolumeTorso": "0",
-        "VolumeScaleArms": "0",
-        "VolumeScaleLegs": "0",
-        "MapScaleAll": "0",
-        "MapScaleHead": "0",
-        "MapScaleWing": "0",
-        "Voice": "",
-        "FootStep": "",
-        "Material": "",
-        "Comment": "",
-    })
+# Creates an Asset Table row with every attribute in its default state, except the ones in overridesDict
+# Attributes that are not columns of the sheet are ignored.
+def create_asset_table_element(schema, overridesDict):
+    return schema.create_row(overridesDict)
 
 def get_accessories_text_for_outfit(outfit):
     return f"""\
@@ -326,33 +387,44 @@ def get_accessories_text_for_outfit(outfit):
 {outfit.description}
 """
 
-# Utility Functions
-
-def write_xml_pretty(xmlDoc, filePath):
-    # Convert the XML tree to a string
-    rough_string = ET.tostring(xmlDoc.getroot(), encoding='utf-8', xml_declaration=True)
-    # Parse the XML again, but using the minidom library
-    reparsed = xml.dom.minidom.parseString(rough_string)
-    # Convert the DOM object back to a pretty-printed string
-    pretty_xml = reparsed.toprettyxml()
-    # This "pretty-printed" string contains a lot of empty lines and spaces, so we need to clean it up
-    # Clean up the pretty XML string. line.strip() evaluates to False if the line is empty or contains only whitespace, so that filters out empty lines.
-    # toprettyxml() also doesn't add a space after the final attribute right before a closing tag, but the original XML does. We're using regex to add it back so that the diff looks clean.
-    # Example:
-    #   Original  : <Param ... Comment="" />
-    #   pretty_xml: <Param ... Comment=""/>
-    cleaned_lines = [re.sub("/>$", " />", line) for line in pretty_xml.split("\n") if line.strip()]
-    # Fix the first line, which is the XML declaration. (prettyxml omits the encoding, so we want to add it back)
-    cleaned_lines[0] = cleaned_lines[0].replace("<?xml version=\"1.0\" ?>", "<?xml version=\"1.0\" encoding=\"utf-8\"?>")
-    # Join the cleaned lines back into a single string
-    cleaned_xml = "\n".join(cleaned_lines)
-    # Write the cleaned XML to a file
-    with open(filePath, 'w', encoding='utf-8') as f:
-        f.write(cleaned_xml)
+# Runs update(outputPath, setupData, xmlDoc) on a private copy of baseXmlDoc, or on the base file if baseXmlDoc is None
+# Module-level (instead of a lambda) so that it can be sent to a worker process when parallel builds are enabled
+def update_from_base(update, setupData, baseXmlDoc, outputPath):
+    update(outputPath, setupData, copy.deepcopy(baseXmlDoc) if baseXmlDoc is not None else None)
+
+# Generates every output of a mod, skipping outputs whose inputs did not change if incrementalBuild is enabled
+#   baseXmlDocs optionally maps 'Item', 'Shop' and 'AssetTable' to already parsed base trees (ex. shared across many mods).
+#   They are not modified. Each output that gets rebuilt works on its own copy.
+#   parallel runs each output on its own worker process. If None, parallelBuild is used.
+def build_mod(setupData, modFolder, baseXmlDocs=None, parallel=None):
+    paths = get_mod_output_paths(modFolder)
+
+    def get_base(name):
+        return baseXmlDocs[name] if baseXmlDocs is not None else None
+
+    # Each output along with a fingerprint of the inputs it is generated from
+    outfitIds = [outfit.id for outfit in setupData]
+    outputs = [
+        (paths['Item'], fingerprint(outputFormatVersion, hash_file(baseItemXmlPath), deltaPatches, outfitIds),
+            functools.partial(update_from_base, update_item_xml, setupData, get_base('Item'))),
+        (paths['Shop'], fingerprint(outputFormatVersion, hash_file(baseShopXmlPath), deltaPatches,
+            [[outfit.id, outfit.shop_chapter] for outfit in setupData]),
+            functools.partial(update_from_base, update_shop_xml, setupData, get_base('Shop'))),
+        (paths['AssetTable'], fingerprint(outputFormatVersion, hash_file(baseAssetTableXmlPath), lowMemoryMode, deltaPatches,
+            [[outfit.id, outfit.bundle_code, outfit.name, outfit.include_obody] for outfit in setupData]),
+            functools.partial(update_from_base, update_asset_table_xml, setupData, get_base('AssetTable'))),
+        (paths['Accessories'], fingerprint(outputFormatVersion, [[outfit.id, outfit.name, outfit.description] for outfit in setupData]),
+            functools.partial(create_accessories_text_file, setupData=setupData)),
+    ]
+    report = build_outputs(outputs, BuildState(paths['BuildState']) if incrementalBuild else None,
+                           parallelBuild if parallel is None else parallel)
+    if validateOutputs:
+        with stage('validate', rows=len(setupData)):
+            report_mod_problems(paths, setupData, baseXmlPaths if deltaPatches else None)
+    return report
 
 
 # Main Execution
-update_item_xml()
-update_shop_xml()
-update_asset_table_xml()
-create_accessories_text_file()
\ No newline at end of file
+if __name__ == '__main__':
+    with profile_session(profileStages, profileDumpPath):
+        build_mod(setupData, modFolder)
@@ -1,26 +1,41 @@
-import os, sys
-from PIL import Image
-
-for src in sys.argv[1:]:
-    outname = os.path.splitext(src)[0]
-    try:
-        img = Image.open(src).convert("RGBA")
-        data = img.getdata()
-        r = [(d[0], d[0], d[0]) for d in data]
-        g = [(d[1], d[1], d[1]) for d in data]
-        b = [(d[2], d[2], d[2]) for d in data]
-        a = [(d[3], d[3], d[3]) for d in data]
-        img.putdata(r)
-        img.convert('RGB')
-        img.save(outname + '_R.png', format="PNG")
-        img.putdata(g)
-        img.convert('RGB')
-        img.save(outname + '_M.png', format="PNG")
-        img.putdata(b)
-        img.convert('RGB')
-        img.save(outname + '_AO.png', format="PNG")
-        img.putdata(a)
-        img.convert('RGB')
-        img.save(outname + '_Mask.png', format="PNG")
-    except IOError:
-        pass
\ No newline at end of file
+import sys
+from TextureUtils import parse_remap_specs, remap_texture, defaultTilePixels, TextureCache, get_texture_cache_path, collect_sources, exclude_remap_outputs, run_batch
+
+# Splits a "Multi" texture into one grayscale image per channel
+# The channels of the Multi texture are: R = R, G = M, B = AO, A = Mask
+# Each output is a single-channel ("L" mode) PNG
+#
+# Usage: python SplitMulti.py <files, directories, or glob patterns>...
+# Directories are expanded to the Multi textures inside them (see multiPattern). Files are processed in parallel, one worker per core.
+# Sources named like an output (ex. "Multi_Texture_R.png") are skipped, even when given explicitly.
+
+multiRemaps = parse_remap_specs([
+    '_R = R',
+    '_M = G',
+    '_AO = B',
+    '_Mask = A',
+])
+
+# Files of a directory argument that are split
+multiPattern = "*[Mm]ulti*.png"
+
+# If True, textures are decoded, remapped and encoded in strips of rows instead of as a whole image (see remap_texture_tiled()).
+# Peak memory is then bounded by the strip size, which keeps very large (ex. 8K) textures from running out of memory.
+lowMemoryMode = False
+
+# Name of the output cache, kept in the folder containing the sources. Sources whose outputs were already generated from the
+# same content are skipped. If None, every source is processed.
+textureCacheName = ".texturecache.json"
+
+# If True, outputs that were deleted or regenerated since they were recorded are removed from the output cache
+pruneTextureCache = False
+
+def split_multi(src):
+    remap_texture(src, multiRemaps, defaultTilePixels if lowMemoryMode else None)
+
+if __name__ == '__main__':
+    sources = exclude_remap_outputs(collect_sources(sys.argv[1:], multiPattern), multiRemaps)
+    cachePath = get_texture_cache_path(sources, textureCacheName) if textureCacheName else None
+    cache = TextureCache(cachePath, multiRemaps, pruneTextureCache) if cachePath else None
+    failures = run_batch(split_multi, sources, cache=cache)
+    sys.exit(1 if failures else 0)
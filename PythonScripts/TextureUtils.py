@@ -0,0 +1,551 @@
+import glob
+import io
+import json
+import os
+import struct
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import numpy as np
+from PIL import Image
+from BuildUtils import fingerprint, get_temp_output_path, write_text_atomic
+from XmlUtils import hash_file
+
+# Shared helpers for the texture scripts (SplitMulti.py, EngageNormal.py, RemapChannels.py, etc.)
+# Images are decoded once into a NumPy array of shape (height, width, 4) and every output is built with array operations
+# instead of per-pixel Python tuples.
+
+# Index of each channel in the (height, width, 4) RGBA array
+R, G, B, A = 0, 1, 2, 3
+
+def load_rgba_array(src):
+    # Decode the image once and return its RGBA buffer as a (height, width, 4) uint8 array
+    with Image.open(src) as img:
+        return np.asarray(img.convert("RGBA"))
+
+def save_image(pixels, filePath):
+    # Save a uint8 array as a PNG. The mode follows the shape: (height, width) is "L" (single-channel),
+    # (height, width, 3) is "RGB" and (height, width, 4) is "RGBA".
+    # Note: PIL needs a contiguous buffer, so a strided view (ex. a single channel sliced out of an RGBA array) is copied once here
+    Image.fromarray(np.ascontiguousarray(pixels)).save(filePath, format="PNG")
+
+# Channel Remapping
+
+# A compiled channel remap spec, such as "_R = R" or ".png = A,G,R,1"
+#   The left side is the output name. It is appended to the source path without its extension (".png" is added if it has no extension).
+#   The right side lists the output channels. Each is a source channel (R, G, B or A) or a constant from 0 to 1 (ex. 1 is 255).
+#   1 output channel makes a grayscale ("L") image, 3 make an RGB image and 4 make an RGBA image.
+# Examples:
+#   "_R = R"           -> <name>_R.png, grayscale copy of the red channel
+#   ".png = A,G,R,1"   -> <name>.png, RGBA with the alpha channel in red, green in green, red in blue, and fully opaque
+class ChannelRemap:
+    channelIndices = {"R": R, "G": G, "B": B, "A": A}
+
+    def __init__(self, spec):
+        self.spec = spec
+        outputName, separator, channels = spec.partition("=")
+        self.outputName = outputName.strip()
+        channelNames = [channel.strip().upper() for channel in channels.split(",")]
+        if not separator or not self.outputName or len(channelNames) not in (1, 3, 4) or "" in channelNames:
+            raise ValueError(f'Invalid channel remap spec "{spec}". Expected "<output> = <channel>[,<channel>...]" with 1, 3 or 4 channels.')
+
+        # Compile the channels into one gather from the source: constants read from an extra plane appended after the RGBA channels
+        self.sourceIndices = []
+        self.constants = []
+        for channelName in channelNames:
+            if channelName in self.channelIndices:
+                self.sourceIndices.append(self.channelIndices[channelName])
+            else:
+                try:
+                    value = float(channelName)
+                except ValueError:
+                    raise ValueError(f'Invalid channel "{channelName}" in channel remap spec "{spec}". Use R, G, B, A or a number from 0 to 1.')
+                if not 0 <= value <= 1:
+                    raise ValueError(f'Constant {channelName} in channel remap spec "{spec}" must be between 0 and 1.')
+                self.sourceIndices.append(4 + len(self.constants))
+                self.constants.append(round(value * 255))
+
+    def get_output_path(self, src):
+        outputPath = os.path.splitext(src)[0] + self.outputName
+        # Note: the extension is checked on the full path, since splitext() treats a name such as ".png" as having no extension
+        return outputPath if os.path.splitext(outputPath)[1] else outputPath + ".png"
+
+    def is_output_path(self, path):
+        # True if path is named like an output of this remap (ex. "Multi_Texture_R.png" for "_R = R")
+        # Remaps whose output name is only an extension (ex. ".png") write over their source, and never match.
+        if self.outputName.startswith("."):
+            return False
+        return os.path.normcase(path).endswith(os.path.normcase(self.get_output_path("")))
+
+    def apply(self, pixels):
+        # pixels is the (height, width, 4) RGBA array of the source. Returns the remapped array.
+        if len(self.sourceIndices) == 1 and not self.constants:
+            # A single source channel: just a view, copied once when it is saved
+            return pixels[:, :, self.sourceIndices[0]]
+        if self.constants:
+            height, width, _ = pixels.shape
+            constantPlanes = np.broadcast_to(np.array(self.constants, dtype=np.uint8), (height, width, len(self.constants)))
+            pixels = np.concatenate((pixels, constantPlanes), axis=2)
+        return pixels[:, :, self.sourceIndices]
+
+def parse_remap_specs(specs):
+    return [ChannelRemap(spec) for spec in specs]
+
+def remap_texture(src, remaps, tilePixels=None, encodeThreads=None):
+    # Decode the source once and produce every output from the same buffer
+    # The outputs are encoded concurrently on a thread pool (one thread per output by default). PNG compression releases the
+    # GIL, so the wall time is about that of the slowest output instead of the sum of all of them.
+    # If tilePixels is set, the image is processed in strips of about that many pixels instead (see remap_texture_tiled())
+    with ThreadPoolExecutor(max_workers=encodeThreads or len(remaps)) as executor:
+        if tilePixels:
+            remap_texture_tiled(src, remaps, tilePixels, executor)
+            return
+        pixels = load_rgba_array(src)
+        # list() waits for every output and raises the first error, if any
+        list(executor.map(lambda remap: save_image(remap.apply(pixels), remap.get_output_path(src)), remaps))
+
+# Tiled Processing
+# For very large textures: the source is decoded one strip of rows at a time, and every output is built and encoded from
+# that strip before the next one is read. Memory use is bounded by the strip size instead of the image size.
+# Outputs are written to temporary files and moved into place at the end, since an output can replace its source.
+
+# Default number of pixels per strip (a strip has as many full rows as fit, and at least one). 1 MB of RGBA pixels.
+defaultTilePixels = 1 << 18
+
+def get_tile_rows(width, tilePixels):
+    return max(1, tilePixels // width)
+
+def remap_texture_tiled(src, remaps, tilePixels=defaultTilePixels, executor=None):
+    # If an executor is given, the outputs of each strip are filtered and compressed concurrently on it
+    outputPaths = [remap.get_output_path(src) for remap in remaps]
+    tempPaths = [get_temp_output_path(outputPath) for outputPath in outputPaths]
+    writers = []
+    try:
+        with open_rgba_strips(src) as reader:
+            writers = [PngStreamWriter(tempPath, reader.width, reader.height, len(remap.sourceIndices)) for remap, tempPath in zip(remaps, tempPaths)]
+            tileRows = get_tile_rows(reader.width, tilePixels)
+            for _ in range(0, reader.height, tileRows):
+                strip = reader.read_rows(tileRows)
+                if executor is None:
+                    for remap, writer in zip(remaps, writers):
+                        writer.write_rows(remap.apply(strip))
+                else:
+                    list(executor.map(lambda remap, writer: writer.write_rows(remap.apply(strip)), remaps, writers))
+            for writer in writers:
+                writer.close()
+    except BaseException:
+        for writer in writers:
+            writer.file.close()
+        for tempPath in tempPaths:
+            if os.path.exists(tempPath):
+                os.remove(tempPath)
+        raise
+    # The source is closed now, so an output can replace it
+    for tempPath, outputPath in zip(tempPaths, outputPaths):
+        os.replace(tempPath, outputPath)
+
+# Opens src for reading in strips of RGBA rows: a PngStreamReader if it is a PNG that can be streamed, a PilStripReader otherwise
+def open_rgba_strips(src):
+    try:
+        return PngStreamReader(src)
+    except ValueError:
+        return PilStripReader(src)
+
+# Reads an image a strip of rows at a time, as (rows, width, 4) RGBA arrays, after PIL decoded the whole image
+# Used for the formats that PngStreamReader can't stream (interlaced or 16-bit PNGs, other formats). Memory use then
+# grows with the image size.
+class PilStripReader:
+    def __init__(self, src):
+        self.image = Image.open(src)
+        self.width, self.height = self.image.size
+        self.rowsRead = 0
+
+    def read_rows(self, count):
+        count = min(count, self.height - self.rowsRead)
+        with self.image.crop((0, self.rowsRead, self.width, self.rowsRead + count)) as strip:
+            rows = np.asarray(strip.convert("RGBA"))
+        self.rowsRead += count
+        return rows
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.image.close()
+        return False
+
+def write_png_chunk(f, chunkType, data):
+    f.write(struct.pack(">I", len(data)))
+    f.write(chunkType)
+    f.write(data)
+    f.write(struct.pack(">I", zlib.crc32(data, zlib.crc32(chunkType))))
+
+pngSignature = b"\x89PNG\r\n\x1a\n"
+
+# Reads a non-interlaced PNG of up to 8 bits per channel a strip of rows at a time, as (rows, width, 4) RGBA arrays,
+# without ever holding the whole image
+# The compressed image data is read and inflated only as far as the requested rows. The rows are then unfiltered and converted
+# by PIL, from a small in-memory PNG that holds just those rows plus the unfiltered row above them (which the Up, Average and
+# Paeth filters refer to). Other PNGs raise ValueError when opened.
+class PngStreamReader:
+    channelCounts = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4}  # PNG color type -> channels per pixel
+    # Bytes per pixel for the filters -> color type of an 8-bit PNG with the same filter layout, used to unfilter the rows
+    unfilterColorTypes = {1: 0, 2: 4, 3: 2, 4: 6}
+    # (bit depth, color type) -> PIL mode and raw mode of the unfiltered rows
+    rowModes = {
+        (1, 0): ("1", "1"), (2, 0): ("L", "L;2"), (4, 0): ("L", "L;4"), (8, 0): ("L", "L"), (8, 2): ("RGB", "RGB"),
+        (1, 3): ("P", "P;1"), (2, 3): ("P", "P;2"), (4, 3): ("P", "P;4"), (8, 3): ("P", "P"), (8, 4): ("LA", "LA"), (8, 6): ("RGBA", "RGBA"),
+    }
+    readSize = 1 << 16
+
+    def __init__(self, src):
+        self.file = open(src, "rb")
+        try:
+            self.read_header()
+        except BaseException:
+            self.file.close()
+            raise
+
+    def read_header(self):
+        if self.file.read(8) != pngSignature:
+            raise ValueError(f"{self.file.name} is not a PNG")
+        palette = None
+        transparency = None
+        while True:
+            length, chunkType = struct.unpack(">I4s", self.file.read(8))
+            if chunkType == b"IDAT":
+                break
+            data = self.file.read(length)
+            self.file.read(4)  # CRC
+            if chunkType == b"IHDR":
+                self.width, self.height, self.bitDepth, self.colorType, _, _, interlace = struct.unpack(">IIBBBBB", data)
+                if interlace or (self.bitDepth, self.colorType) not in self.rowModes:
+                    raise ValueError(f"{self.file.name} is interlaced or has 16 bits per channel, and can't be read in strips")
+            elif chunkType == b"PLTE":
+                palette = data
+            elif chunkType == b"tRNS":
+                transparency = data
+            elif chunkType == b"IEND":
+                raise ValueError(f"{self.file.name} has no image data")
+
+        bitsPerPixel = self.bitDepth * self.channelCounts[self.colorType]
+        self.stride = (self.width * bitsPerPixel + 7) // 8
+        self.filterBytesPerPixel = max(1, bitsPerPixel // 8)
+        self.transparentColor = None
+        if self.colorType == 3:
+            # Palette index -> RGBA
+            self.palette = np.zeros((256, 4), dtype=np.uint8)
+            self.palette[:, A] = 255
+            colors = np.frombuffer(palette or b"", dtype=np.uint8)[:768].reshape(-1, 3)
+            self.palette[:len(colors), :3] = colors
+            if transparency:
+                self.palette[:len(transparency), A] = np.frombuffer(transparency, dtype=np.uint8)[:256]
+        elif transparency and self.colorType in (0, 2):
+            # Pixels of this color are fully transparent. Gray levels of less than 8 bits are scaled to 0-255 like PIL does.
+            scale = 255 // ((1 << self.bitDepth) - 1)
+            self.transparentColor = np.array(struct.unpack(f">{len(transparency) // 2}H", transparency), dtype=np.int32) * scale
+
+        self.idatRemaining = length
+        self.decompressor = zlib.decompressobj()
+        self.pending = bytearray()
+        self.previousRow = bytes(self.stride)
+        self.rowsRead = 0
+
+    def read_compressed(self):
+        # Returns the next piece of the compressed image data, or b"" at the end of the IDAT chunks
+        while self.idatRemaining == 0:
+            self.file.read(4)  # CRC of the previous IDAT chunk
+            length, chunkType = struct.unpack(">I4s", self.file.read(8))
+            if chunkType != b"IDAT":
+                return b""
+            self.idatRemaining = length
+        data = self.file.read(min(self.idatRemaining, self.readSize))
+        if not data:
+            raise ValueError(f"{self.file.name} is truncated")
+        self.idatRemaining -= len(data)
+        return data
+
+    def read_rows(self, count):
+        count = min(count, self.height - self.rowsRead)
+        # Each row is its filter type byte followed by stride bytes
+        needed = count * (self.stride + 1)
+        while len(self.pending) < needed:
+            data = self.decompressor.unconsumed_tail or self.read_compressed()
+            if not data:
+                raise ValueError(f"{self.file.name} is truncated")
+            self.pending += self.decompressor.decompress(data, needed - len(self.pending))
+        filteredRows = bytes(self.pending[:needed])
+        del self.pending[:needed]
+
+        # Unfilter: a small PNG with the same filter layout, holding the row above (unfiltered, with filter type 0) and the rows
+        unfilterPng = io.BytesIO()
+        unfilterPng.write(pngSignature)
+        write_png_chunk(unfilterPng, b"IHDR", struct.pack(">IIBBBBB", self.stride // self.filterBytesPerPixel, count + 1, 8,
+                                                            self.unfilterColorTypes[self.filterBytesPerPixel], 0, 0, 0))
+        write_png_chunk(unfilterPng, b"IDAT", zlib.compress(b"\x00" + self.previousRow + filteredRows, 0))
+        write_png_chunk(unfilterPng, b"IEND", b"")
+        unfilterPng.seek(0)
+        with Image.open(unfilterPng) as img:
+            rows = img.tobytes()[self.stride:]
+        self.previousRow = rows[-self.stride:]
+        self.rowsRead += count
+
+        mode, rawMode = self.rowModes[self.bitDepth, self.colorType]
+        img = Image.frombytes(mode, (self.width, count), rows, "raw", rawMode)
+        if self.colorType == 3:
+            return self.palette[np.asarray(img)]
+        pixels = np.array(img.convert("RGBA"))
+        if self.transparentColor is not None:
+            # The gray level of a grayscale pixel is in its R, G and B channels, so it is compared on R only
+            pixels[(pixels[:, :, :len(self.transparentColor)] == self.transparentColor).all(axis=2), A] = 0
+        return pixels
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.file.close()
+        return False
+
+# Writes an 8-bit PNG incrementally, a few rows at a time, without ever holding the whole image
+# Each row gets the filter (None, Sub, Up, Average or Paeth) with the smallest sum of absolute differences, the usual
+# heuristic from the PNG specification, so the files are about as small as the ones written by PIL.
+class PngStreamWriter:
+    colorTypes = {1: 0, 3: 2, 4: 6}  # Channels -> PNG color type (grayscale, RGB, RGBA)
+    # Rows are filtered about this many bytes at a time, so that the temporaries of filter_png_rows() stay small
+    filterChunkBytes = 1 << 16
+
+    def __init__(self, filePath, width, height, channels, compressLevel=6):
+        self.width = width
+        self.height = height
+        self.channels = channels
+        self.rowsWritten = 0
+        self.previousRow = np.zeros(width * channels, dtype=np.uint8)
+        self.compressor = zlib.compressobj(compressLevel)
+        self.file = open(filePath, "wb")
+        self.file.write(pngSignature)
+        self.write_chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, self.colorTypes[channels], 0, 0, 0))
+
+    def write_chunk(self, chunkType, data):
+        write_png_chunk(self.file, chunkType, data)
+
+    def write_rows(self, rows):
+        # rows is a (count, width) or (count, width, channels) uint8 array
+        stride = self.width * self.channels
+        rows = np.ascontiguousarray(rows).reshape(len(rows), stride)
+        if self.rowsWritten + len(rows) > self.height:
+            raise ValueError(f"Too many rows written to {self.file.name} (expected {self.height})")
+        chunkRows = max(1, self.filterChunkBytes // stride)
+        for start in range(0, len(rows), chunkRows):
+            chunk = rows[start:start + chunkRows]
+            compressed = self.compressor.compress(filter_png_rows(chunk, self.previousRow, self.channels).tobytes())
+            if compressed:
+                self.write_chunk(b"IDAT", compressed)
+            self.previousRow = chunk[-1].copy()
+        self.rowsWritten += len(rows)
+
+    def close(self):
+        if self.file.closed:
+            return
+        try:
+            if self.rowsWritten == self.height:
+                self.write_chunk(b"IDAT", self.compressor.flush())
+                self.write_chunk(b"IEND", b"")
+        finally:
+            self.file.close()
+        if self.rowsWritten != self.height:
+            raise ValueError(f"Only {self.rowsWritten} of {self.height} rows were written to {self.file.name}")
+
+def filter_png_rows(rows, previousRow, bytesPerPixel):
+    # Returns the filtered scanlines (filter type byte + filtered row) of rows, a (count, stride) uint8 array
+    # All five filters are computed for the whole strip at once and the best one is picked per row.
+    x = rows.astype(np.int16)
+    a = np.zeros_like(x)  # Left
+    a[:, bytesPerPixel:] = x[:, :-bytesPerPixel]
+    b = np.empty_like(x)  # Up
+    b[0] = previousRow
+    b[1:] = x[:-1]
+    c = np.zeros_like(x)  # Up-left
+    c[:, bytesPerPixel:] = b[:, :-bytesPerPixel]
+    p = a + b - c
+    pa, pb, pc = np.abs(p - a), np.abs(p - b), np.abs(p - c)
+    paeth = np.where((pa <= pb) & (pa <= pc), a, np.where(pb <= pc, b, c))
+    candidates = np.stack((x, x - a, x - b, x - ((a + b) >> 1), x - paeth)).astype(np.uint8)
+    scores = np.abs(candidates.view(np.int8).astype(np.int32)).sum(axis=2)
+    best = scores.argmin(axis=0)
+
+    filtered = np.empty((len(rows), rows.shape[1] + 1), dtype=np.uint8)
+    filtered[:, 0] = best
+    filtered[:, 1:] = candidates[best, np.arange(len(rows))]
+    return filtered
+
+# Output Cache
+# Remembers, for each source content hash and remap operation, the hashes of the outputs that were generated from it.
+# A source whose outputs all still exist with those hashes is skipped without being decoded.
+# A file that is itself an up to date output of the operation is skipped as well, which keeps in-place conversions
+# (ex. EngageNormal.py) from being applied twice, and outputs picked up by a directory or glob from being processed again.
+
+textureCacheVersion = 1
+textureCacheName = ".texturecache.json"
+
+def get_texture_cache_path(sources, cacheName=textureCacheName):
+    # The cache is kept in the folder containing the sources (their common parent folder if they are in several), so that
+    # it follows the textures instead of the folder the script is run from. Returns None if there are no sources.
+    folders = [os.path.dirname(os.path.abspath(src)) for src in sources]
+    if not folders:
+        return None
+    try:
+        folder = os.path.commonpath(folders)
+    except ValueError:
+        # Sources on different drives
+        folder = folders[0]
+    return os.path.join(folder, cacheName)
+
+class TextureCache:
+    def __init__(self, cachePath, remaps, prune=False):
+        self.cachePath = cachePath
+        self.remaps = remaps
+        # If True, outputs that were deleted or regenerated since they were recorded are removed when the cache is saved
+        self.prune = prune
+        # The operation only depends on what each output contains, not on how it is encoded (tiled or not, threads, etc.)
+        self.operation = fingerprint([(remap.outputName, remap.sourceIndices, remap.constants) for remap in remaps])
+        # "<operation>:<source hash>" -> {absolute output path: output hash}
+        try:
+            with open(cachePath, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+            self.entries = cache['entries'] if cache.get('version') == textureCacheVersion else {}
+        except (OSError, ValueError):
+            self.entries = {}
+        # Absolute output path -> hash, for every output recorded for this operation
+        self.outputHashes = {}
+        for key, outputs in self.entries.items():
+            if key.startswith(f"{self.operation}:"):
+                self.outputHashes.update(outputs)
+        self.sourceHashes = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get_key(self, sourceHash):
+        return f"{self.operation}:{sourceHash}"
+
+    def is_output_up_to_date(self, outputPath, outputHash):
+        return os.path.exists(outputPath) and hash_file(outputPath) == outputHash
+
+    def is_up_to_date(self, src):
+        sourceHash = hash_file(src)
+        self.sourceHashes[src] = sourceHash
+        outputs = self.entries.get(self.get_key(sourceHash), {})
+        upToDate = True
+        for remap in self.remaps:
+            outputPath = remap.get_output_path(src)
+            outputHash = outputs.get(os.path.abspath(outputPath))
+            if outputHash is None or not self.is_output_up_to_date(outputPath, outputHash):
+                upToDate = False
+                break
+        # The source may also be one of our own outputs
+        if upToDate or self.outputHashes.get(os.path.abspath(src)) == sourceHash:
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def record(self, src):
+        # Call after the outputs of src were generated. Uses the source hash from before they were (see is_up_to_date()).
+        sourceHash = self.sourceHashes.get(src) or hash_file(src)
+        outputs = self.entries.setdefault(self.get_key(sourceHash), {})
+        for remap in self.remaps:
+            outputPath = os.path.abspath(remap.get_output_path(src))
+            outputs[outputPath] = self.outputHashes[outputPath] = hash_file(outputPath)
+
+    def prune_stale_entries(self):
+        # Removes the outputs that were deleted or regenerated from another source since they were recorded, and the entries
+        # left without any output. Returns the number of outputs removed.
+        pruned = 0
+        for key in list(self.entries):
+            outputs = self.entries[key]
+            for outputPath, outputHash in list(outputs.items()):
+                if not self.is_output_up_to_date(outputPath, outputHash):
+                    del outputs[outputPath]
+                    pruned += 1
+            if not outputs:
+                del self.entries[key]
+        return pruned
+
+    def save(self):
+        pruned = self.prune_stale_entries() if self.prune else 0
+        write_text_atomic(self.cachePath, json.dumps({'version': textureCacheVersion, 'entries': self.entries}, indent=4, sort_keys=True))
+        print(f"Texture cache: {self.hits} hit(s), {self.misses} miss(es)" + (f", {pruned} stale output(s) pruned" if self.prune else ""))
+
+# Batch Processing
+
+def collect_sources(args, pattern="*.png"):
+    # Expands the command line arguments into a sorted list of source files
+    # Each argument can be a file, a directory (every file in it matching pattern), or a glob pattern
+    sources = set()
+    for arg in args:
+        if os.path.isdir(arg):
+            sources.update(glob.glob(os.path.join(arg, pattern)))
+        elif glob.has_magic(arg):
+            sources.update(path for path in glob.glob(arg, recursive=True) if os.path.isfile(path))
+        else:
+            sources.add(arg)
+    return sorted(sources)
+
+def exclude_remap_outputs(sources, remaps):
+    # Removes the sources that are named like an output of one of the remaps, so that outputs picked up by a directory or
+    # glob from an earlier run (ex. "Multi_Texture_R.png") are not split again
+    kept = []
+    for src in sources:
+        remap = next((remap for remap in remaps if remap.is_output_path(src)), None)
+        if remap is None:
+            kept.append(src)
+        else:
+            print(f"Skipping {src} : named like an output of \"{remap.spec}\"")
+    return kept
+
+def _timed_call(func, src):
+    # Runs func(src) in a worker process and reports (src, elapsed seconds, error message or None)
+    # Errors are returned instead of raised so that one bad file does not abort the whole batch
+    start = time.perf_counter()
+    try:
+        func(src)
+        error = None
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    return src, time.perf_counter() - start, error
+
+def run_batch(func, sources, maxWorkers=None, cache=None):
+    # Runs func on every source file on a process pool (one worker per core by default)
+    # Prints the timing of each file as it finishes, then a throughput line and a summary of failures
+    # If a TextureCache is given, sources whose outputs are up to date are skipped, the outputs of the other ones are recorded
+    # in it, and it is saved at the end
+    # Returns the list of (src, error message) failures
+    if cache is not None:
+        sources = [src for src in sources if not cache.is_up_to_date(src)]
+    failures = []
+    totalBytes = 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=maxWorkers or os.cpu_count()) as executor:
+        futures = [executor.submit(_timed_call, func, src) for src in sources]
+        for future in as_completed(futures):
+            src, elapsed, error = future.result()
+            if error is None:
+                totalBytes += os.path.getsize(src)
+                print(f"{src} : {elapsed:.2f}s")
+                if cache is not None:
+                    cache.record(src)
+            else:
+                failures.append((src, error))
+                print(f"{src} : FAILED after {elapsed:.2f}s")
+    wallTime = time.perf_counter() - start
+
+    succeeded = len(sources) - len(failures)
+    print(f"Processed {succeeded}/{len(sources)} files in {wallTime:.2f}s "
+          f"({succeeded / wallTime if wallTime else 0:.2f} files/s, {totalBytes / 1e6 / wallTime if wallTime else 0:.2f} MB/s)")
+    if failures:
+        print(f"{len(failures)} file(s) failed:")
+        for src, error in failures:
+            print(f"  {src} : {error}")
+    if cache is not None:
+        cache.save()
+    return failures
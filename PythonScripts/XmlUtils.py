@@ -0,0 +1,600 @@
+import hashlib
+import os
+import pickle
+import sys
+import warnings
+import xml.etree.ElementTree as ET
+from collections import defaultdict
+from pathlib import Path
+
+# Shared helpers for the XML data scripts (ClassOutfitReplacer.py, SetupNewModOutfit.py, etc.)
+
+# Index of the <Param> rows of a sheet by attribute value, built in a single pass over the rows
+# This replaces repeated data.findall("Param[@Attr='value']") calls, which each scan every row of the sheet
+# If an overlay (SheetOverlay) is given, rows are read through it and changes are written to it, leaving data untouched
+class AttributeIndex:
+    def __init__(self, data, attributeNames, tag='Param', overlay=None):
+        self.overlay = overlay
+        # index[attributeName][value] is a dict used as an ordered set of the rows with that value (in document order)
+        self.index = {name: defaultdict(dict) for name in attributeNames}
+        for row in data:
+            if row.tag != tag:
+                continue
+            for name, rowsByValue in self.index.items():
+                value = self.get(row, name)
+                if value is not None:
+                    rowsByValue[value][row] = None
+
+    # Equivalent to data.findall(f"Param[@{attributeName}='{value}']")
+    def find(self, attributeName, value):
+        rows = self.index[attributeName].get(value)
+        return list(rows) if rows else []
+
+    # Current value of an attribute of a row (including changes made through the overlay)
+    def get(self, row, attributeName):
+        return self.overlay.get(row, attributeName) if self.overlay is not None else row.get(attributeName)
+
+    # Sets an attribute on a row and moves the row to its new bucket so that later lookups see the new value
+    def set(self, row, attributeName, value):
+        rowsByValue = self.index[attributeName]
+        oldValue = self.get(row, attributeName)
+        if oldValue is not None:
+            rowsByValue[oldValue].pop(row, None)
+        if self.overlay is not None:
+            self.overlay.set(row, attributeName, value)
+        else:
+            row.set(attributeName, value)
+        rowsByValue[value][row] = None
+
+# Inserts rows into an element in a single rebuild of its child list, instead of one insert() (which shifts every later child) per row
+#   insertions maps the index of the child the rows go before (len(element) for the end) to the list of rows to insert there
+def insert_rows(element, insertions):
+    children = list(element)
+    newChildren = []
+    start = 0
+    for beforeIndex in sorted(insertions):
+        newChildren += children[start:beforeIndex]
+        newChildren += insertions[beforeIndex]
+        start = beforeIndex
+    newChildren += children[start:]
+    element[:] = newChildren
+
+# Escaping (matches what ElementTree writes, so output stays identical to xmlDoc.write())
+
+def escape_attribute(value):
+    if "&" in value:
+        value = value.replace("&", "&amp;")
+    if "<" in value:
+        value = value.replace("<", "&lt;")
+    if ">" in value:
+        value = value.replace(">", "&gt;")
+    if "\"" in value:
+        value = value.replace("\"", "&quot;")
+    if "\r" in value:
+        value = value.replace("\r", "&#13;")
+    if "\n" in value:
+        value = value.replace("\n", "&#10;")
+    if "\t" in value:
+        value = value.replace("\t", "&#09;")
+    return value
+
+def escape_text(text):
+    if "&" in text:
+        text = text.replace("&", "&amp;")
+    if "<" in text:
+        text = text.replace("<", "&lt;")
+    if ">" in text:
+        text = text.replace(">", "&gt;")
+    return text
+
+def start_tag(element, attributeItems=None):
+    if attributeItems is None:
+        attributeItems = element.items()
+    attributes = "".join(f' {key}="{escape_attribute(value)}"' for key, value in attributeItems)
+    return f"<{element.tag}{attributes}"
+
+# Copy-on-Write Overlay
+
+# Holds the edits to one sheet (changed attributes and appended rows) on top of a base tree that is never modified
+# Many overlays can share one parsed base tree, so memory grows with the number of edits instead of the number of variants.
+# The edits are merged with the base rows while the overlay is written out.
+class SheetOverlay:
+    def __init__(self, xmlDoc, dataPath='Sheet/Data'):
+        self.xmlDoc = xmlDoc
+        self.data = xmlDoc.getroot().find(dataPath)
+        if self.data is None:
+            raise ValueError(f'Could not find the "{dataPath}" element to overlay!')
+        self.changes = {}       # Base row -> {attribute name: new value}
+        self.appendedRows = []  # New rows, added to the end of the data element
+
+    def get(self, row, attributeName, default=None):
+        changes = self.changes.get(row)
+        if changes is not None and attributeName in changes:
+            return changes[attributeName]
+        return row.get(attributeName, default)
+
+    def set(self, row, attributeName, value):
+        self.changes.setdefault(row, {})[attributeName] = value
+
+    def append(self, row):
+        self.appendedRows.append(row)
+
+    # Writes the base tree with the edits merged in, in the same format as xmlDoc.write(filePath, encoding="utf-8", xml_declaration=True)
+    def write(self, filePath):
+        with open(filePath, 'w', encoding='utf-8', errors='xmlcharrefreplace') as f:
+            f.write("<?xml version='1.0' encoding='utf-8'?>\n")
+            self.write_element(f, self.xmlDoc.getroot(), None)
+
+    def write_element(self, f, element, tail):
+        # tail is the whitespace written after the element (normally element.tail)
+        changes = self.changes.get(element)
+        attributeItems = {**element.attrib, **changes}.items() if changes else None
+        appendedRows = self.appendedRows if element is self.data else []
+        if len(element) == 0 and not appendedRows and not element.text:
+            f.write(start_tag(element, attributeItems) + " />")
+        else:
+            f.write(start_tag(element, attributeItems) + ">" + escape_text(element.text or ""))
+            if appendedRows:
+                # Appended rows go after the last row, separated the same way as the existing rows.
+                # The last row's tail (the whitespace before the closing tag) moves after the last appended row.
+                rows = list(element)
+                separator = rows[0].tail if len(rows) > 1 else element.text or "\n"
+                for row in rows[:-1]:
+                    self.write_element(f, row, row.tail)
+                if rows:
+                    self.write_element(f, rows[-1], separator)
+                for row in appendedRows[:-1]:
+                    self.write_element(f, row, separator)
+                self.write_element(f, appendedRows[-1], rows[-1].tail if rows else element.text)
+            else:
+                for child in element:
+                    self.write_element(f, child, child.tail)
+            f.write(f"</{element.tag}>")
+        if tail:
+            f.write(escape_text(tail))
+
+    # Writes only the edits, as a delta patch of basePath (the file the base tree was parsed from, see write_xml_patch())
+    def write_patch(self, filePath, basePath):
+        sheet = next(sheet for sheet in self.xmlDoc.getroot().iter('Sheet') if sheet.find('Data') is self.data)
+        patch = SheetPatch(sheet.get('Name'))
+        if self.changes:
+            for rowIndex, row in enumerate(self.data):
+                changes = self.changes.get(row)
+                for attributeName, value in (changes or {}).items():
+                    if row.get(attributeName) != value:
+                        patch.set(rowIndex, attributeName, value)
+        if self.appendedRows:
+            patch.append(self.appendedRows)
+        write_xml_patch(filePath, basePath, [patch])
+
+# Pretty Printing
+
+# Writes the XML tree in the same format as the game's XML files, in one pass straight to the file:
+#   <?xml version="1.0" encoding="utf-8"?> declaration, one element per line, tab indentation, and " />" at the end of empty elements
+# Whitespace between elements in the tree is ignored and replaced with the indentation above.
+# This produces the same output as the old minidom round-trip (ET.tostring -> minidom.parseString -> toprettyxml -> regex clean-up)
+# without building any intermediate copies of the document (see tests/test_xml_utils.py).
+# One difference: line breaks and tabs in attribute values are written as &#10; and &#09; (like ElementTree does), where minidom
+# wrote them as is. None of the game's XML files have any.
+#   appendedRows optionally maps elements of the tree to rows (ex. CompactRow) written after their children, as if they were appended
+def write_xml_pretty(xmlDoc, filePath, appendedRows=None):
+    with open(filePath, 'w', encoding='utf-8') as f:
+        f.write('<?xml version="1.0" encoding="utf-8"?>')
+        write_element_pretty(f, xmlDoc.getroot(), "\n", appendedRows)
+
+def write_element_pretty(f, element, indent, appendedRows=None):
+    # indent is the newline plus the tabs that go before this element
+    f.write(indent + start_tag(element))
+    rows = appendedRows.get(element, ()) if appendedRows else ()
+    if len(element) or rows:
+        f.write(">")
+        childIndent = indent + "\t"
+        for child in element:
+            write_element_pretty(f, child, childIndent, appendedRows)
+        for row in rows:
+            write_element_pretty(f, row, childIndent)
+        f.write(f"{indent}</{element.tag}>")
+    elif element.text:
+        text = element.text
+        if not text.strip():
+            # Whitespace only. Keep just the indentation of the last line (blank lines are dropped).
+            text = text[text.rfind("\n"):] if "\n" in text else text
+        f.write(">" + escape_text(text) + f"</{element.tag}>")
+    else:
+        f.write(" />")
+
+# Compact Rows
+
+# Column order and default value of each column of a sheet, read once from its <Header>
+# Each <Param> of the header describes a column, and its Ident is the name of the column's attribute in the rows.
+# The default value of a column is its Min (ex. "0" for the u8 and float columns), or empty if it has none.
+class SheetSchema:
+    def __init__(self, columns, defaults):
+        self.columns = tuple(columns)
+        self.defaults = tuple(defaults)
+        self.columnIndices = {column: i for i, column in enumerate(self.columns)}
+        # Column indices of the rows, shared by every row with the same non-default columns (ex. every uBody row)
+        self.layouts = {}
+
+    @classmethod
+    def from_header(cls, header):
+        return cls([param.get('Ident') for param in header], [param.get('Min') or '' for param in header])
+
+    # Creates a row with every column at its default value except the ones in values. Unknown columns are ignored.
+    # The values are interned, so that the rows of the same outfit share their Conditions, models, etc.
+    def create_row(self, values):
+        overrides = sorted((self.columnIndices[column], value) for column, value in values.items()
+                           if column in self.columnIndices and value != self.defaults[self.columnIndices[column]])
+        layout = bytes(i for i, _ in overrides) if len(self.columns) <= 256 else tuple(i for i, _ in overrides)
+        return CompactRow(self, self.layouts.setdefault(layout, layout), tuple(sys.intern(value) for _, value in overrides))
+
+# Reads the schema of a sheet from its <Header> without parsing the rest of the file
+#   sheetName selects the <Sheet Name="...">. If None, the first sheet is used.
+def read_sheet_schema(xmlPath, sheetName=None):
+    inTargetSheet = False
+    for event, element in ET.iterparse(xmlPath, events=('start', 'end')):
+        if event == 'start' and element.tag == 'Sheet':
+            inTargetSheet = sheetName is None or element.get('Name') == sheetName
+        elif event == 'end' and element.tag == 'Header' and inTargetSheet:
+            return SheetSchema.from_header(element)
+    raise ValueError(f'Could not find the <Header> of sheet "{sheetName}" in {xmlPath}!' if sheetName else f'Could not find a <Header> in {xmlPath}!')
+
+# A generated <Param> row that only stores the values that differ from the defaults of its schema
+# It has the parts of the Element interface that the writers use (tag, items(), get(), len(), text), and is only expanded
+# to every column when it is written (see write_xml_pretty() and rewrite_sheet_streaming()).
+class CompactRow:
+    __slots__ = ('schema', 'columnIndices', 'values')
+    tag = 'Param'
+    text = None
+    tail = None
+
+    def __init__(self, schema, columnIndices, values):
+        self.schema = schema
+        self.columnIndices = columnIndices  # Indices of the non-default columns, in column order
+        self.values = values                # Values of those columns
+
+    def __len__(self):
+        return 0
+
+    def __iter__(self):
+        return iter(())
+
+    def get(self, attributeName, default=None):
+        i = self.schema.columnIndices.get(attributeName)
+        if i is None:
+            return default
+        for columnIndex, value in zip(self.columnIndices, self.values):
+            if columnIndex == i:
+                return value
+        return self.schema.defaults[i]
+
+    def items(self):
+        values = list(self.schema.defaults)
+        for i, value in zip(self.columnIndices, self.values):
+            values[i] = value
+        return list(zip(self.schema.columns, values))
+
+    @property
+    def attrib(self):
+        return dict(self.items())
+
+# Streaming Rewrite
+
+# Rewrites a sheet XML file (<Book><Sheet><Header/><Data/></Sheet></Book>) while it is being read, without keeping the tree in memory
+#   updateRow(row) is called on every <Param> row of the target <Data> element before it is written, and may modify it in place
+#   newRows are appended to the end of the target <Data> element
+#   sheetName selects the <Sheet Name="..."> to modify. If None, the first sheet is modified.
+# The original formatting (XML declaration, whitespace between elements, attribute order, comments and processing instructions,
+# and everything after the closing tag of the root) is copied from the input, so the output only differs from the input where rows
+# were changed or added.
+# Exception: the whitespace between the comments and processing instructions that come before the root is written as a line break.
+# Each row is written and dropped from the tree as soon as it is complete, so peak memory does not grow with the size of the file.
+def rewrite_sheet_streaming(inputPath, outputPath, updateRow=None, newRows=(), sheetName=None, chunkSize=1 << 16):
+    # Comments and processing instructions are inserted in the tree, so that the whitespace after them is their tail.
+    # Otherwise, it would be merged with the whitespace before them.
+    parser = ET.XMLPullParser(events=("start", "end", "comment", "pi"),
+                              _parser=ET.XMLParser(target=ET.TreeBuilder(insert_comments=True, insert_pis=True)))
+    root = None
+    stack = []              # Currently open elements
+    pendingStart = None     # Element whose start tag is not written yet (we don't know yet whether it is empty)
+    pendingTail = None      # Element that has ended but whose tail (the whitespace after it) is not written yet
+    targetData = None       # The <Data> element being modified
+    rowSeparator = None     # Whitespace between two rows of the target <Data>, used to indent appended rows
+    sheetFound = False
+
+    with open(inputPath, "rb") as src, open(outputPath, "w", encoding="utf-8", newline="") as out:
+        # Copy the XML declaration as is. ElementTree does not report it as an event.
+        firstLine = src.readline()
+        if firstLine.lstrip().startswith(b"<?xml"):
+            out.write(firstLine.decode("utf-8"))
+        parser.feed(firstLine)
+
+        def write_pending():
+            # Writes what comes before a new child of stack[-1]
+            nonlocal pendingStart, pendingTail, rowSeparator
+            if pendingStart is not None:
+                # The pending element has a child, so it is not empty
+                out.write(start_tag(pendingStart) + ">" + escape_text(pendingStart.text or ""))
+                pendingStart = None
+            elif pendingTail is not None:
+                # The tail of the previous sibling is the whitespace between it and this element
+                if pendingTail.tail and stack[-1] is targetData:
+                    rowSeparator = pendingTail.tail
+                out.write(escape_text(pendingTail.tail or ""))
+                stack[-1].remove(pendingTail)
+                pendingTail = None
+
+        def handle(event, element):
+            nonlocal root, pendingStart, pendingTail, targetData, sheetFound
+            if event in ("comment", "pi"):
+                text = f"<!--{element.text}-->" if event == "comment" else f"<?{element.text}?>"
+                if stack:
+                    write_pending()
+                    out.write(text)
+                    pendingTail = element
+                elif root is None:
+                    out.write(text + "\n")
+                # The ones after the root are copied with the rest of the end of the file
+                return
+            if event == "start":
+                if stack:
+                    write_pending()
+                else:
+                    root = element
+                if element.tag == "Sheet" and not sheetFound and (sheetName is None or element.get("Name") == sheetName):
+                    sheetFound = True
+                elif element.tag == "Data" and sheetFound and targetData is None and stack and stack[-1].tag == "Sheet":
+                    targetData = element
+                stack.append(element)
+                pendingStart = element
+            else:
+                stack.pop()
+                if pendingStart is element and not (element is targetData and newRows):
+                    # Empty element
+                    if updateRow is not None and stack and stack[-1] is targetData:
+                        updateRow(element)
+                    if element.text:
+                        out.write(start_tag(element) + ">" + escape_text(element.text) + f"</{element.tag}>")
+                    else:
+                        out.write(start_tag(element) + " />")
+                elif pendingStart is element:
+                    # The target <Data> has no rows of its own, but we are appending some
+                    out.write(start_tag(element) + ">")
+                    write_new_rows("\n")
+                    out.write(escape_text(element.text or "\n") + f"</{element.tag}>")
+                else:
+                    closingWhitespace = ""
+                    if pendingTail is not None:
+                        # The tail of the last child is the whitespace before the closing tag
+                        closingWhitespace = pendingTail.tail or ""
+                        element.remove(pendingTail)
+                    if element is targetData:
+                        # With a single row, there is no whitespace between two rows. The whitespace before the first row has the same indentation.
+                        write_new_rows(rowSeparator if rowSeparator is not None else element.text or closingWhitespace)
+                    out.write(escape_text(closingWhitespace) + f"</{element.tag}>")
+                pendingStart = None
+                pendingTail = element
+
+        def write_new_rows(separator):
+            for row in newRows:
+                out.write(separator + start_tag(row) + " />")
+
+        while True:
+            chunk = src.read(chunkSize)
+            if not chunk:
+                break
+            parser.feed(chunk)
+            for event, element in parser.read_events():
+                handle(event, element)
+        parser.close()
+        for event, element in parser.read_events():
+            handle(event, element)
+
+        # Copy what follows the root (line break, comments, etc.) as is, from the end of the file. ElementTree drops the
+        # whitespace outside of the root.
+        if root is not None:
+            closingTag = f"</{root.tag}>".encode("utf-8")
+            fileSize = src.seek(0, os.SEEK_END)
+            for endSize in (1 << 12, 1 << 20, fileSize):
+                src.seek(max(0, fileSize - endSize))
+                end = src.read()
+                rootEnd = end.rfind(closingTag)
+                if rootEnd >= 0:
+                    out.write(end[rootEnd + len(closingTag):].decode("utf-8"))
+                    break
+
+    if targetData is None:
+        raise ValueError(f"Could not find the <Data> element of sheet {sheetName!r} in {inputPath}!")
+
+# Delta Patches
+
+# The edits to one sheet of a base XML file, written as a delta patch (see write_xml_patch()) instead of a full copy of the file
+# Rows of the base <Data> are located by their index (0 for the first row), which always finds the same row in the same base file.
+#   sheetName is the Name of the <Sheet>. If None, the first sheet is patched.
+class SheetPatch:
+    def __init__(self, sheetName=None):
+        self.sheetName = sheetName
+        self.modifiedRows = {}  # Base row index -> {attribute name: new value}
+        self.insertedRows = {}  # Base row index the new rows go before (None for the end of <Data>) -> new rows
+
+    def set(self, rowIndex, attributeName, value):
+        self.modifiedRows.setdefault(rowIndex, {})[attributeName] = value
+
+    def insert(self, beforeIndex, rows):
+        self.insertedRows.setdefault(beforeIndex, []).extend(rows)
+
+    def append(self, rows):
+        self.insert(None, rows)
+
+# Writes the edits of sheetPatches to filePath, without the rows of the base file. The patch looks like this:
+# <XmlPatch Base="base_AssetTable.xml" BaseSha256="...">
+#     <Sheet Name="アセット">
+#         <Modify Row="1234">
+#             <Param DressModel="uBody_Lev0AF_c100" />      Only the attributes that changed
+#         </Modify>
+#         <Insert Before="8">                               Before the 9th row of the base <Data> (no Before: at the end)
+#             <Param ... />                                 New rows, with every attribute
+#         </Insert>
+#     </Sheet>
+# </XmlPatch>
+# The SHA-256 of the base file is recorded so that the patch is never applied to another version of the file, where the
+# row indices would point to other rows. The size of the patch only depends on the number of edits.
+def write_xml_patch(filePath, basePath, sheetPatches):
+    root = ET.Element('XmlPatch', {'Base': Path(basePath).name, 'BaseSha256': hash_file(basePath)})
+    # <Insert> element -> new rows, written as if they were its children (the rows can be CompactRows)
+    insertedRows = {}
+    for patch in sheetPatches:
+        sheet = ET.SubElement(root, 'Sheet', {'Name': patch.sheetName} if patch.sheetName is not None else {})
+        for rowIndex, changes in sorted(patch.modifiedRows.items()):
+            ET.SubElement(ET.SubElement(sheet, 'Modify', {'Row': str(rowIndex)}), 'Param', changes)
+        for beforeIndex, rows in sorted(patch.insertedRows.items(), key=lambda item: (item[0] is None, item[0] or 0)):
+            insert = ET.SubElement(sheet, 'Insert', {'Before': str(beforeIndex)} if beforeIndex is not None else {})
+            insertedRows[insert] = rows
+    write_xml_pretty(ET.ElementTree(root), filePath, insertedRows)
+
+# Applies delta patches (written by write_xml_patch()) to a tree parsed from their base file. The tree is modified in place.
+#   baseSha256 is the hash of the base file. If given, every patch must have been made from that same file.
+# Row indices always refer to the rows of the base file, so several patches of the same base (ex. from different mods)
+# can be applied together. Rows inserted at the same place keep the order of the patches. If two patches set the same
+# attribute of a row, the last one wins.
+def apply_xml_patches(xmlDoc, patchPaths, baseSha256=None):
+    root = xmlDoc.getroot()
+    # <Data> element -> its original rows, and the rows to insert ({before index: rows}, in the order of the patches)
+    originalRows = {}
+    insertions = defaultdict(lambda: defaultdict(list))
+    changedBy = {}  # (row, attribute name) -> patch that set it, to report conflicts
+    for patchPath in patchPaths:
+        patchRoot = ET.parse(patchPath).getroot()
+        if baseSha256 is not None and patchRoot.get('BaseSha256') != baseSha256:
+            raise ValueError(f"{patchPath} was made from another version of {patchRoot.get('Base')} and cannot be applied!")
+        for sheetPatch in patchRoot.iter('Sheet'):
+            sheetName = sheetPatch.get('Name')
+            sheet = root.find(f'Sheet[@Name="{sheetName}"]') if sheetName is not None else root.find('Sheet')
+            data = sheet.find('Data') if sheet is not None else None
+            if data is None:
+                raise ValueError(f'Could not find the <Data> of sheet "{sheetName}" to apply {patchPath}!')
+            rows = originalRows.setdefault(data, list(data))
+            for operation in sheetPatch:
+                if operation.tag == 'Modify':
+                    rowIndex = int(operation.get('Row'))
+                    if rowIndex >= len(rows):
+                        raise ValueError(f"{patchPath} modifies row {rowIndex}, but sheet \"{sheetName}\" only has {len(rows)} rows!")
+                    for attributeName, value in operation[0].items():
+                        previousPatch = changedBy.get((rows[rowIndex], attributeName))
+                        if previousPatch is not None and rows[rowIndex].get(attributeName) != value:
+                            warnings.warn(f"{patchPath} overrides {attributeName} of row {rowIndex} set by {previousPatch}")
+                        changedBy[rows[rowIndex], attributeName] = patchPath
+                        rows[rowIndex].set(attributeName, value)
+                elif operation.tag == 'Insert':
+                    insertions[data][int(operation.get('Before', len(rows)))] += list(operation)
+
+    # Insert every row at once, so the original indices still point to the right rows
+    for data, dataInsertions in insertions.items():
+        insert_rows(data, dataInsertions)
+
+# Returns the tree of a base file with delta patches applied, as if they were full copies of the file with the edits
+def read_patched_xml(basePath, patchPaths):
+    xmlDoc = parse_xml_cached(basePath)
+    apply_xml_patches(xmlDoc, patchPaths, hash_file(basePath))
+    return xmlDoc
+
+# Reads the rows of a sheet XML file one by one, calls updateRow(row) on each, and returns the changes as a SheetPatch
+# This is the delta patch counterpart of rewrite_sheet_streaming(updateRow=...): nothing but the changes is written.
+#   sheetName selects the <Sheet Name="...">. If None, the first sheet is read.
+def diff_sheet_streaming(inputPath, updateRow, sheetName=None):
+    patch = SheetPatch(sheetName)
+    targetData = None
+    sheetFound = False
+    inTargetSheet = False
+    rowIndex = 0
+    stack = []
+    for event, element in ET.iterparse(inputPath, events=('start', 'end')):
+        if event == 'start':
+            if element.tag == 'Sheet' and not sheetFound and (sheetName is None or element.get('Name') == sheetName):
+                sheetFound = inTargetSheet = True
+                patch.sheetName = element.get('Name')
+            elif element.tag == 'Data' and inTargetSheet and targetData is None and stack and stack[-1].tag == 'Sheet':
+                targetData = element
+            stack.append(element)
+            continue
+        stack.pop()
+        if element.tag == 'Sheet':
+            inTargetSheet = False
+        if stack and stack[-1] is targetData:
+            originalValues = dict(element.attrib)
+            updateRow(element)
+            for attributeName, value in element.items():
+                if originalValues.get(attributeName) != value:
+                    patch.set(rowIndex, attributeName, value)
+            rowIndex += 1
+        if stack and stack[-1].tag == 'Data':
+            # The row is done, drop it so that memory does not grow with the size of the file
+            stack[-1].remove(element)
+    if targetData is None:
+        raise ValueError(f"Could not find the <Data> element of sheet {sheetName!r} in {inputPath}!")
+    return patch
+
+# Parse Cache
+
+# Bump this whenever the format of the cache files changes so that old cache files are ignored
+xmlCacheVersion = 1
+
+# Parses an XML file, using a pickled copy of the parsed tree from a previous run when the file has not changed
+# The cache file lives in cacheFolder (by default a ".xmlcache" folder next to the XML file) and is keyed by the file's
+# modification time, size and SHA-256 hash. If only the modification time changed (ex. the file was touched or copied),
+# the hash is checked and the cache entry is reused. Otherwise the file is parsed again and the cache entry is replaced.
+# Every call returns a fresh tree, so callers are free to modify it.
+def parse_xml_cached(xmlPath, cacheFolder=None):
+    xmlPath = Path(xmlPath)
+    cacheFolder = Path(cacheFolder) if cacheFolder is not None else xmlPath.parent / '.xmlcache'
+    cachePath = cacheFolder / f"{xmlPath.name}.pickle"
+    stat = xmlPath.stat()
+
+    header = read_xml_cache_header(cachePath)
+    if header is not None:
+        version, mtime, size, sha256 = header
+        if version == xmlCacheVersion and size == stat.st_size:
+            if mtime == stat.st_mtime_ns:
+                root = read_xml_cache_root(cachePath)
+                if root is not None:
+                    return ET.ElementTree(root)
+            elif sha256 == hash_file(xmlPath):
+                root = read_xml_cache_root(cachePath)
+                if root is not None:
+                    # Same content, new modification time. Update the entry so that next time we can skip hashing.
+                    write_xml_cache(cachePath, stat.st_mtime_ns, stat.st_size, sha256, root)
+                    return ET.ElementTree(root)
+
+    xmlDoc = ET.parse(xmlPath)
+    write_xml_cache(cachePath, stat.st_mtime_ns, stat.st_size, hash_file(xmlPath), xmlDoc.getroot())
+    return xmlDoc
+
+def hash_file(filePath):
+    with open(filePath, 'rb') as f:
+        return hashlib.file_digest(f, 'sha256').hexdigest()
+
+# A cache file holds two pickles: the header (version, mtime, size, sha256) and then the root element.
+# Keeping them separate lets us validate the header without unpickling the whole tree.
+def read_xml_cache_header(cachePath):
+    try:
+        with open(cachePath, 'rb') as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+        return None
+
+def read_xml_cache_root(cachePath):
+    try:
+        with open(cachePath, 'rb') as f:
+            pickle.load(f)  # Skip the header
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, ValueError):
+        return None
+
+def write_xml_cache(cachePath, mtime, size, sha256, root):
+    # Write to a temporary file and then rename it so that an interrupted run never leaves a half-written cache file behind
+    cachePath.parent.mkdir(parents=True, exist_ok=True)
+    tempPath = cachePath.with_name(cachePath.name + '.tmp')
+    with open(tempPath, 'wb') as f:
+        pickle.dump((xmlCacheVersion, mtime, size, sha256), f, protocol=pickle.HIGHEST_PROTOCOL)
+        pickle.dump(root, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tempPath, cachePath)
@@ -0,0 +1,37 @@
+import xml.etree.ElementTree as ET
+from ModValidator import validate_mod_outputs
+from SetupNewModOutfit import OutfitData, create_accessories_text_file
+
+def write_sheet(filePath, sheetName, rows):
+    book = ET.Element('Book', {'Count': '1'})
+    data = ET.SubElement(ET.SubElement(book, 'Sheet', {'Name': sheetName}), 'Data')
+    for attributes in rows:
+        ET.SubElement(data, 'Param', attributes)
+    ET.ElementTree(book).write(filePath, encoding='utf-8', xml_declaration=True)
+
+# Writes consistent outputs for setupData, with extraAssetRows appended to the rows of AssetTable.xml
+def write_mod_outputs(tmp_path, setupData, extraAssetRows=()):
+    paths = {name: tmp_path / fileName for name, fileName in
+             (('Item', 'Item.xml'), ('Shop', 'Shop.xml'), ('AssetTable', 'AssetTable.xml'), ('Accessories', 'accessories.txt'))}
+    write_sheet(paths['Item'], 'アクセサリ', [{'Aid': f"AID_{outfit.id}", 'Name': f"MAID_{outfit.id}", 'Help': f"MAID_H_{outfit.id}"} for outfit in setupData])
+    write_sheet(paths['Shop'], 'アクセサリー屋', [{'Aid': f"AID_{outfit.id}"} for outfit in setupData])
+    assetRows = [
+        # A row of the base file, for a character rather than an accessory
+        {'Conditions': 'AID_Person_リン;', 'DressModel': 'uBody_Lyn0AF_c000'},
+    ]
+    for outfit in setupData:
+        assetRows.append({'Conditions': f"AID_{outfit.id};女装;!チキ;!竜化;", 'DressModel': f"uBody_{outfit.bundle_code}"})
+        assetRows.append({'Conditions': f"AID_{outfit.id};女装;!チキ;!竜化;", 'BodyModel': f"oBody_{outfit.bundle_code}"})
+    write_sheet(paths['AssetTable'], 'AssetTable', assetRows + list(extraAssetRows))
+    create_accessories_text_file(paths['Accessories'], setupData)
+    return paths
+
+setupData = [OutfitData('Lev0AF_c100', id='SkimpyThiefT1'), OutfitData('Lev0AF_c101', id='SkimpyArmorT1')]
+
+def test_consistent_outputs(tmp_path):
+    assert validate_mod_outputs(write_mod_outputs(tmp_path, setupData), setupData) == []
+
+def test_dangling_asset_table_aid(tmp_path):
+    # A row of the mod whose AID has a typo, so it matches no outfit
+    paths = write_mod_outputs(tmp_path, setupData, [{'Conditions': 'AID_SkimpyThiefTl;女装;', 'DressModel': 'uBody_Lev0AF_c100'}])
+    assert validate_mod_outputs(paths, setupData) == ["AssetTable.xml: AID_SkimpyThiefTl is not an accessory of Item.xml"]
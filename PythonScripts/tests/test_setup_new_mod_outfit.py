@@ -0,0 +1,10 @@
+import pytest
+from SetupNewModOutfit import OutfitData
+
+def test_shop_chapter_from_string():
+    assert OutfitData('Lev0AF_c100', shop_chapter="7").shop_chapter == 7
+
+@pytest.mark.parametrize('shopChapter', ["seven", "", 7.5, None])
+def test_invalid_shop_chapter(shopChapter):
+    with pytest.raises(ValueError, match="shop_chapter of outfit SkimpyThiefT1"):
+        OutfitData('Lev0AF_c100', id='SkimpyThiefT1', shop_chapter=shopChapter)
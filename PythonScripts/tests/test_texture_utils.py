@@ -0,0 +1,18 @@
+import os
+from TextureUtils import parse_remap_specs, exclude_remap_outputs, get_texture_cache_path
+
+multiRemaps = parse_remap_specs(['_R = R', '_M = G', '_AO = B', '_Mask = A'])
+
+def test_exclude_remap_outputs():
+    sources = ["Multi_Texture.png", "Multi_Texture_R.png", "Multi_Texture_Mask.png", "Hair_Rough.png"]
+    assert exclude_remap_outputs(sources, multiRemaps) == ["Multi_Texture.png", "Hair_Rough.png"]
+
+# Remaps that write over their source have no output name to recognize
+def test_exclude_remap_outputs_in_place():
+    assert exclude_remap_outputs(["Body_Normal.png"], parse_remap_specs(['.png = A,G,R,1'])) == ["Body_Normal.png"]
+
+def test_texture_cache_next_to_sources(tmp_path):
+    sources = [tmp_path / 'Body' / 'Multi.png', tmp_path / 'Hair' / 'Multi.png']
+    assert get_texture_cache_path(sources[:1]) == os.path.join(tmp_path / 'Body', '.texturecache.json')
+    assert get_texture_cache_path(sources) == os.path.join(tmp_path, '.texturecache.json')
+    assert get_texture_cache_path([]) is None
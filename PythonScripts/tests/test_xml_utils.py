@@ -0,0 +1,116 @@
+import copy
+import re
+import xml.dom.minidom
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from SetupNewModOutfit import OutfitData, create_asset_table_rows
+from XmlUtils import read_sheet_schema, rewrite_sheet_streaming, write_xml_pretty
+
+baseXmlFolder = Path(__file__).parent.parent / 'BaseXml'
+
+def create_book(rowCount):
+    book = ET.Element('Book', {'Count': '1'})
+    sheet = ET.SubElement(book, 'Sheet', {'Name': 'Test'})
+    ET.SubElement(ET.SubElement(sheet, 'Header'), 'Param', {'Ident': 'Aid'})
+    data = ET.SubElement(sheet, 'Data')
+    for i in range(rowCount):
+        ET.SubElement(data, 'Param', {'Aid': f"AID_{i}"})
+    return ET.ElementTree(book)
+
+# Appending rows while streaming a pretty-printed file gives the same bytes as pretty-printing the tree with the rows appended
+def check_streamed_rows_match_pretty_printer(tmp_path, rowCount):
+    inputPath = tmp_path / 'input.xml'
+    write_xml_pretty(create_book(rowCount), inputPath)
+    newRows = [ET.Element('Param', {'Aid': 'AID_New1'}), ET.Element('Param', {'Aid': 'AID_New2'})]
+    rewrite_sheet_streaming(inputPath, tmp_path / 'streamed.xml', newRows=newRows)
+
+    expected = create_book(rowCount)
+    expected.getroot().find('Sheet/Data').extend(newRows)
+    write_xml_pretty(expected, tmp_path / 'expected.xml')
+    assert (tmp_path / 'streamed.xml').read_bytes() == (tmp_path / 'expected.xml').read_bytes()
+
+def test_append_to_one_row_sheet(tmp_path):
+    check_streamed_rows_match_pretty_printer(tmp_path, 1)
+
+def test_append_to_many_row_sheet(tmp_path):
+    check_streamed_rows_match_pretty_printer(tmp_path, 3)
+
+commentedBook = """<?xml version="1.0" encoding="utf-8"?>
+<!-- Generated -->
+<Book Count="1">
+\t<!-- Accessories -->
+\t<Sheet Name="Test">
+\t\t<Header>
+\t\t\t<Param Ident="Aid" />
+\t\t</Header>
+\t\t<Data>
+\t\t\t<Param Aid="AID_0" />
+\t\t\t<!-- Outfits -->
+\t\t\t<?editor fold?>
+\t\t\t<Param Aid="AID_1" />
+\t\t</Data>
+\t</Sheet>
+</Book>
+<!-- End -->
+"""
+
+# Comments, processing instructions and what follows the root are kept, whatever the chunks the file is read in
+def test_streaming_keeps_comments_and_end_of_file(tmp_path):
+    inputPath = tmp_path / 'input.xml'
+    inputPath.write_bytes(commentedBook.encode('utf-8'))
+    for chunkSize in (1, 7, 1 << 16):
+        rewrite_sheet_streaming(inputPath, tmp_path / 'output.xml', chunkSize=chunkSize)
+        assert (tmp_path / 'output.xml').read_bytes() == inputPath.read_bytes()
+
+def test_streaming_appends_after_comments(tmp_path):
+    inputPath = tmp_path / 'input.xml'
+    inputPath.write_bytes(commentedBook.encode('utf-8'))
+    rewrite_sheet_streaming(inputPath, tmp_path / 'output.xml', newRows=[ET.Element('Param', {'Aid': 'AID_2'})])
+    expected = commentedBook.replace('\t\t\t<Param Aid="AID_1" />\n', '\t\t\t<Param Aid="AID_1" />\n\t\t\t<Param Aid="AID_2" />\n')
+    assert (tmp_path / 'output.xml').read_bytes() == expected.encode('utf-8')
+
+# Pretty Printing
+
+# The minidom round-trip that write_xml_pretty() replaced, kept as the reference for its output
+def write_xml_pretty_minidom(xmlDoc, filePath):
+    roughString = ET.tostring(xmlDoc.getroot(), encoding='utf-8', xml_declaration=True)
+    prettyXml = xml.dom.minidom.parseString(roughString).toprettyxml()
+    cleanedLines = [re.sub("/>$", " />", line) for line in prettyXml.split("\n") if line.strip()]
+    cleanedLines[0] = cleanedLines[0].replace("<?xml version=\"1.0\" ?>", "<?xml version=\"1.0\" encoding=\"utf-8\"?>")
+    with open(filePath, 'w', encoding='utf-8') as f:
+        f.write("\n".join(cleanedLines))
+
+# Writes xmlDoc with both writers and compares the bytes
+#   rows are appended to the element at dataPath (with write_xml_pretty()'s appendedRows for the new writer)
+def check_pretty_printer_matches_minidom(tmp_path, xmlDoc, dataPath=None, rows=()):
+    write_xml_pretty(xmlDoc, tmp_path / 'pretty.xml', {xmlDoc.getroot().find(dataPath): rows} if dataPath else None)
+    # The old writer only knew about the tree, so the rows are appended to a copy of it
+    expected = copy.deepcopy(xmlDoc)
+    if dataPath:
+        expected.getroot().find(dataPath).extend(ET.Element(row.tag, dict(row.items())) for row in rows)
+    write_xml_pretty_minidom(expected, tmp_path / 'minidom.xml')
+    assert (tmp_path / 'pretty.xml').read_bytes() == (tmp_path / 'minidom.xml').read_bytes()
+
+def test_pretty_printer_matches_minidom_item(tmp_path):
+    check_pretty_printer_matches_minidom(tmp_path, ET.parse(baseXmlFolder / 'base_Item.xml'))
+
+def test_pretty_printer_matches_minidom_shop(tmp_path):
+    check_pretty_printer_matches_minidom(tmp_path, ET.parse(baseXmlFolder / 'base_Shop.xml'))
+
+def test_pretty_printer_matches_minidom_asset_table_with_appended_rows(tmp_path):
+    assetTablePath = baseXmlFolder / 'base_AssetTable_NoDebug.xml'
+    setupData = [OutfitData('Lev0AF_c100', id='SkimpyThiefT1', name='Thief'), OutfitData('Lev0AF_c101', id='SkimpyArmorT1', include_obody=False)]
+    rows = create_asset_table_rows(setupData, read_sheet_schema(assetTablePath))
+    check_pretty_printer_matches_minidom(tmp_path, ET.parse(assetTablePath), 'Sheet/Data', rows)
+
+# The one difference with the minidom round-trip: line breaks and tabs in attribute values are written as character references,
+# like ElementTree does, instead of as is (where they could be mistaken for the line breaks and indentation between elements)
+def test_pretty_printer_escapes_line_breaks_and_tabs_in_attributes(tmp_path):
+    xmlDoc = create_book(1)
+    xmlDoc.getroot().find('Sheet/Data/Param').set('Aid', "AID_0\n\tNext")
+    write_xml_pretty(xmlDoc, tmp_path / 'pretty.xml')
+    assert '<Param Aid="AID_0&#10;&#09;Next" />' in (tmp_path / 'pretty.xml').read_text(encoding='utf-8')
+    write_xml_pretty_minidom(xmlDoc, tmp_path / 'minidom.xml')
+    assert '<Param Aid="AID_0\n\tNext" />' in (tmp_path / 'minidom.xml').read_text(encoding='utf-8')
+    # Both are read back as the same value
+    assert ET.parse(tmp_path / 'pretty.xml').getroot().find('Sheet/Data/Param').get('Aid') == "AID_0\n\tNext"